@@ -0,0 +1,208 @@
+from dataclasses import dataclass, replace
+
+import numpy as np
+
+from column import Column
+from rebars import RebarLayout
+from biaxial import DEPTH_RATIOS, interaction_surface
+from utils import (
+    calculate_areas,
+    calculate_areas_in_rect,
+    calculate_areas_in_polygon,
+    polygon_section,
+)
+
+
+# ----------------------------------------------------------------
+## Inputs, immutable
+# ----------------------------------------------------------------
+@dataclass(frozen=True)
+class Material:
+    fc: float = 23.5  # concrete, MPa
+    fy: float = 395  # main bar, MPa
+    fv: float = 235  # traverse, MPa
+    Es: float = 200000  # MPa
+
+
+@dataclass(frozen=True, eq=False)
+class Section:
+    """
+    shape : "rect", "circle" or "polygon"
+    b, h : width and depth of rect, diameter of circle (b = h),
+        bounding box of polygon, cm
+    rebars : RebarLayout, z from the top edge
+    main_dia, traverse_dia : mm
+    stirrup : "tie" or "spiral"
+    concrete : "whitney" stress block or "fiber" section
+    mesh : fibers n x n for rect/polygon, n rings x 4n sectors for circle
+    polygon : (outline, holes) vertices of polygon section, cm
+    N : rebars counted in Ast, default all of rebars
+    """
+
+    shape: str
+    b: float
+    h: float
+    rebars: RebarLayout
+    main_dia: float
+    traverse_dia: float
+    stirrup: str = "tie"
+    concrete: str = "whitney"
+    mesh: int = 20
+    polygon: tuple = None
+    N: int = None
+
+    # Ag, Ast, An in cm2
+    def areas(self):
+        N = len(self.rebars) if self.N is None else self.N
+        if self.shape == "circle":
+            return calculate_areas(self.b, self.main_dia / 10, N)
+        if self.shape == "polygon":
+            outer, holes = polygon_section(*self.polygon)
+            return calculate_areas_in_polygon(outer, holes, self.main_dia / 10, N)
+        return calculate_areas_in_rect(self.b, self.h, self.main_dia / 10, N)
+
+    # Rect section turned for the Y-Y axis, b and h swapped, z as rect.y_axis
+    def swapped(self):
+        if self.shape != "rect":
+            raise ValueError(f"Y-Y axis of {self.shape} section is not supported")
+        return replace(self, b=self.h, h=self.b, rebars=self.rebars.swapped(self.b))
+
+
+# ----------------------------------------------------------------
+## Results, immutable
+# ----------------------------------------------------------------
+@dataclass(frozen=True)
+class ControlPoint:
+    name: str
+    𝜙Pn: float  # kN, compression positive
+    𝜙Mn: float  # kN-m
+    c: float  # nuetral axis from top, cm, nan for pure compression / tension
+
+
+@dataclass(frozen=True)
+class Diagnostics:
+    d: float  # effective depth, cm
+    d2: float  # d', cm
+    β1: float
+    ρg: float  # Ast / Ag
+    ρg_ok: bool  # 0.01 < ρg < 0.08
+    𝜙Pn_max: float  # kN, compression positive
+    traverse: float  # tie spacing required (cm) or spiral ratio ρ
+
+
+@dataclass(frozen=True, eq=False)
+class IRCurve:
+    """
+    Pn, Mn : 𝜙Pn (kN, compression positive) and 𝜙Mn (kN-m) from pure
+        compression through the dense curve to pure tension, read-only
+    """
+
+    points: tuple  # of ControlPoint
+    Pn: np.ndarray
+    Mn: np.ndarray
+    diagnostics: Diagnostics
+
+    def point(self, name):
+        for point in self.points:
+            if point.name == name:
+                return point
+        raise KeyError(name)
+
+
+# ----------------------------------------------------------------
+## Analysis, no shared state and no console output
+# ----------------------------------------------------------------
+# Each call builds its own Column, so calls can run in any thread
+def _column(section, material):
+    Ag, Ast, An = section.areas()
+    column = Column(
+        material.fc,
+        material.fv,
+        material.fy,
+        material.Es,
+        section.b,
+        section.h,
+        section.shape,
+        section.stirrup,
+        concrete=section.concrete,
+        mesh=section.mesh,
+        polygon=section.polygon,
+        verbose=False,
+    )
+    column.initialize(section.main_dia / 10, section.traverse_dia / 10, Ast, An, Ag)
+    return column, Ag, Ast, An
+
+
+def _read_only(*arrays):
+    for a in arrays:
+        a.setflags(write=False)
+    return arrays
+
+
+def ir_curve(section, material, n_points=200, tol=None):
+    """
+    IR-diagram of section about its X-X axis, same curve as rect.py /
+    circular.py. Use section.swapped() for the Y-Y axis of rect section.
+    tol : None for n_points uniform depths, else adaptive curve of at most
+        n_points depths, see Column.dense_curve
+    """
+    column, Ag, Ast, An = _column(section, material)
+    main_dia, rebars = section.main_dia, section.rebars
+
+    𝜙Pn_pc, 𝜙Pn_max = column.pure_compression(Ast, An)
+    𝜙Pn_zt, 𝜙Mn_zt, c_zt = column.zero_tension(main_dia, rebars)
+    𝜙Pn_b, 𝜙Mn_b, c_b = column.balance(main_dia, rebars)
+    _, 𝜙Mn_pb, c_pb = column.pure_bending(main_dia, rebars)
+
+    𝜙Pn_pt = column.pure_tension(Ast * 1e2)
+
+    _, 𝜙Pn, 𝜙Mn = column.dense_curve(
+        c_zt, c_pb, main_dia, rebars["z"], n_points, tol, (c_zt, c_b, c_pb)
+    )
+
+    points = (
+        ControlPoint("pure_compression", abs(𝜙Pn_pc), 0.0, np.nan),
+        ControlPoint("zero_tension", abs(𝜙Pn_zt), 𝜙Mn_zt, c_zt),
+        ControlPoint("balance", abs(𝜙Pn_b), 𝜙Mn_b, c_b),
+        ControlPoint("pure_bending", 0.0, 𝜙Mn_pb, c_pb),
+        ControlPoint("pure_tension", 𝜙Pn_pt, 0.0, np.nan),
+    )
+    diagnostics = Diagnostics(
+        d=column.d,
+        d2=column.d2,
+        β1=column.β1,
+        ρg=Ast / Ag,
+        ρg_ok=bool(0.01 < Ast / Ag < 0.08),
+        𝜙Pn_max=abs(𝜙Pn_max),
+        traverse=float(
+            column.traverse(An, Ag, main_dia / 10, section.traverse_dia / 10)
+        ),
+    )
+    Pn, Mn = _read_only(np.r_[abs(𝜙Pn_pc), -𝜙Pn, 𝜙Pn_pt], np.r_[0, 𝜙Mn, 0])
+
+    return IRCurve(points, Pn, Mn, diagnostics)
+
+
+# 𝜙Mn (kN-m) and nuetral axis c (cm) at axial loads Pu (kN, compression positive)
+def capacity_at(section, material, Pu):
+    column, _, Ast, An = _column(section, material)
+    return column.capacity_at(Pu, section.main_dia, section.rebars["z"], Ast, An)
+
+
+# P-Mx-My surface of rect or polygon section, see biaxial.interaction_surface
+def surface(section, material, angles=36, depths=DEPTH_RATIOS):
+    if section.shape == "circle":
+        raise ValueError("Circular section is checked with its IR-curve")
+    column, _, Ast, An = _column(section, material)
+    return _read_only(
+        *interaction_surface(
+            column,
+            section.rebars["x"],
+            section.rebars["y"],
+            section.main_dia,
+            Ast,
+            An,
+            angles=angles,
+            depths=depths,
+        )
+    )
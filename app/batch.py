@@ -0,0 +1,372 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from absl import app, flags
+from absl.flags import FLAGS
+
+from utils import convert_input_to_list, information
+import analysis
+from pipeline import row_section, row_material, load_checks, as_list
+from pipeline import capacity_lookups, DEFAULTS
+from cache import CurveCache, section_key
+from report import HTMLReport, section_block
+from parallel import BACKENDS, executor
+from store import ResultWriter
+from lookup import CapacityLookup
+import timing
+
+flags.DEFINE_string("input", None, "sections and loads, .csv or .json")
+flags.DEFINE_string("output", "batch_results.csv", "results, .csv or .json")
+flags.DEFINE_string("store", None, "columnar results directory, instead of --output")
+flags.DEFINE_integer("workers", 0, "workers, 0 = all cores")
+flags.DEFINE_enum("backend", "process", BACKENDS, "executor of workers")
+flags.DEFINE_string("cache_dir", None, "directory of cached IR-curves, optional")
+flags.DEFINE_integer("n_points", 200, "points on IR-diagram curve")
+flags.DEFINE_float(
+    "curve_tol", None, "adaptive IR-diagram curve, e.g. 1e-3 of its size"
+)
+flags.DEFINE_bool("timing", False, "print per-stage timing summary")
+flags.DEFINE_string("timing_output", None, "write per-stage timing as .json")
+flags.DEFINE_string("report", None, "HTML report of the sections, optional")
+flags.DEFINE_float("report_max_mb", 50, "start a new report page past this size, MB")
+flags.DEFINE_integer("report_max_sections", None, "sections per report page")
+
+
+# ----------------------------------------------------------------
+## Input / Output
+# ----------------------------------------------------------------
+def read_sections(path):
+    """
+    One section and its loads per row / object:
+    id, section(rect|circle), b, h, dia, fc, fy, fv, Es, c,
+    main_dia, traverse_dia (mm), bottom_layers, top_layers("3 2"),
+    middle_rebars, N, stirrup(tie|spiral), concrete(whitney|fiber), mesh,
+    Pu, Mux, Muy
+    Polygon sections (section = polygon) give outline [[x, y], ...],
+    holes [[[x, y], ...], ...] and bars [[x, y], ...] in cm instead of
+    b, h, dia and the layers
+    """
+    if path.endswith(".json"):
+        with open(path) as f:
+            rows = json.load(f)
+        if isinstance(rows, dict):
+            rows = rows["sections"]
+    else:
+        rows = pd.read_csv(path, dtype={"bottom_layers": str, "top_layers": str})
+        rows = rows.where(rows.notna(), None).to_dict("records")
+
+    sections = []
+    for i, row in enumerate(rows):
+        row = {**DEFAULTS, **{k: v for k, v in row.items() if v is not None}}
+        row.setdefault("id", i + 1)
+        sections.append(row)
+    return sections
+
+
+def write_results(path, results):
+    df = pd.DataFrame(results)
+    if path.endswith(".json"):
+        df.to_json(path, orient="records", indent=2, force_ascii=False)
+    else:
+        df.to_csv(path, index=False, float_format="%.3f")
+
+
+# ----------------------------------------------------------------
+## Section capacity, depends on the section only and is cached
+# ----------------------------------------------------------------
+def ir_curve(section, material, label):
+    curve = analysis.ir_curve(section, material, FLAGS.n_points, FLAGS.curve_tol)
+    point = {p.name: p for p in curve.points}
+
+    return {
+        "𝜙Pn_pure_compression": point["pure_compression"].𝜙Pn,
+        "𝜙Pn_max": curve.diagnostics.𝜙Pn_max,
+        "𝜙Pn_pure_tension": point["pure_tension"].𝜙Pn,
+        f"𝜙Pn_zero_tension{label}": point["zero_tension"].𝜙Pn,
+        f"𝜙Mn_zero_tension{label}": point["zero_tension"].𝜙Mn,
+        f"𝜙Pn_balance{label}": point["balance"].𝜙Pn,
+        f"𝜙Mn_balance{label}": point["balance"].𝜙Mn,
+        f"𝜙Mn_pure_bending{label}": point["pure_bending"].𝜙Mn,
+        f"curve_Pn{label}": curve.Pn,
+        f"curve_Mn{label}": curve.Mn,
+        **CapacityLookup.from_curve(curve.Pn, curve.Mn).to_arrays(f"lookup{label}_"),
+    }
+
+
+def surface(section, material):
+    𝜙Pn, 𝜙Mnx, 𝜙Mny = analysis.surface(section, material)
+    return {"surface_Pn": 𝜙Pn, "surface_Mnx": 𝜙Mnx, "surface_Mny": 𝜙Mny}
+
+
+def row_capacity(row):
+    section, material = row_section(row), row_material(row)
+
+    # Circle: X-X Axis curve only
+    if section.shape == "circle":
+        return ir_curve(section, material, "")
+
+    # X-X Axis curve and the surface for biaxial checks
+    capacity = ir_curve(section, material, "_x") | surface(section, material)
+
+    # Y-Y Axis of rect, swap b, h as rect.y_axis
+    if section.shape == "rect":
+        capacity |= ir_curve(section.swapped(), material, "_y")
+    return capacity
+
+
+# Section fields the capacity depends on, loads and id are left out
+def capacity_key(row):
+    fields = ["section", "fc", "fy", "fv", "Es", "c", "main_dia", "traverse_dia"]
+    fields += ["concrete"] + (["mesh"] if row["concrete"] == "fiber" else [])
+    if row["section"] == "rect":
+        fields += ["b", "h", "middle_rebars", "stirrup"]
+        layers = {
+            "bottom_layers": convert_input_to_list(str(row["bottom_layers"])),
+            "top_layers": convert_input_to_list(str(row["top_layers"])),
+        }
+    elif row["section"] == "polygon":
+        fields += ["stirrup"]
+        layers = {k: as_list(row.get(k, [])) for k in ("outline", "holes", "bars")}
+    else:
+        fields += ["dia", "N", "stirrup"]
+        layers = {}
+    return section_key(
+        **{k: row[k] for k in fields},
+        **layers,
+        n_points=FLAGS.n_points,
+        curve_tol=FLAGS.curve_tol,
+    )
+
+
+def section_capacity(row):
+    return _cache.get_or_compute(capacity_key(row), lambda: row_capacity(row))
+
+
+# ----------------------------------------------------------------
+## Load checks, from the capacity arrays only
+# ----------------------------------------------------------------
+def check_loads(row, capacity):
+    surface = None
+    if row["section"] != "circle":
+        surface = [capacity[f"surface_{k}"] for k in ("Pn", "Mnx", "Mny")]
+    checks = load_checks(
+        row["section"],
+        row["Pu"],
+        row["Mux"],
+        row["Muy"],
+        capacity_lookups(capacity),
+        surface,
+    )
+    return {k: float(v) for k, v in checks.items()}
+
+
+# ----------------------------------------------------------------
+## HTML report block, built in the worker so only the text is sent back
+# ----------------------------------------------------------------
+def report_block(row, capacity):
+    import plot_rect
+    import plot_circular
+
+    Pu, Mux, Muy = row["Pu"], row["Mux"], row["Muy"]
+    covering, main_dia = float(row["c"]), float(row["main_dia"])
+    traverse_dia = float(row["traverse_dia"])
+
+    if row["section"] == "rect":
+        section_fig, ir_fig = plot_rect.create_plot(
+            float(row["b"]),
+            float(row["h"]),
+            covering,
+            traverse_dia,
+            main_dia,
+            convert_input_to_list(str(row["bottom_layers"])),
+            convert_input_to_list(str(row["top_layers"])),
+            int(row["middle_rebars"]),
+            capacity["curve_Mn_x"],
+            capacity["curve_Pn_x"],
+            capacity["curve_Mn_y"],
+            capacity["curve_Pn_y"],
+            Pu,
+            Mux,
+            Muy,
+        )
+        widths = ("25%", "60%")
+    elif row["section"] == "circle":
+        dia, N = float(row["dia"]), int(row["N"])
+        data = information(dia, covering, main_dia / 10, traverse_dia / 10, N)
+        section_fig, ir_fig = plot_circular.create_plot(
+            dia / 2,
+            dia,
+            main_dia / 10,
+            N,
+            data,
+            capacity["curve_Mn"],
+            capacity["curve_Pn"],
+            Pu,
+            np.hypot(Mux, Muy),
+        )
+        widths = ("48%", "48%")
+    else:
+        return None  # no section plot for polygons yet
+
+    return section_block(section_fig, ir_fig, row["id"], widths)
+
+
+# One row, headless: the analysis API prints nothing
+def analyse(row):
+    result = {"id": row["id"], "section": row["section"]}
+    try:
+        capacity = section_capacity(row)
+        result |= {k: float(v) for k, v in capacity.items() if np.ndim(v) == 0}
+        if _curves:
+            result |= {k: v for k, v in capacity.items() if k.startswith("curve_")}
+        result |= check_loads(row, capacity)
+        if _report:
+            result["_html"] = report_block(row, capacity)
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+
+    # Sent back to the main process with the result and merged there,
+    # worker threads already share its timers
+    if timing.ENABLED and os.getpid() != _parent:
+        result["_timing"] = timing.snapshot(reset_after=True)
+    return result
+
+
+_cache = CurveCache()
+_report = False
+_curves = False
+_parent = os.getpid()
+
+
+def _init_worker(
+    cache_dir, n_points, timing_enabled=False, report=False, curves=False, tol=None
+):
+    global _cache, _report, _curves
+    _cache = CurveCache(cache_dir)
+    _report = report
+    _curves = curves
+    timing.enable(timing_enabled)
+    if not FLAGS.is_parsed():
+        argv = ["batch", f"--n_points={n_points}"]
+        if tol is not None:
+            argv.append(f"--curve_tol={tol}")
+        FLAGS(argv)
+
+
+def iter_run(
+    sections, workers=0, cache_dir=None, report=False, backend="process", curves=False
+):
+    """
+    Results in the order of sections, yielded as they are ready
+    report = True adds the HTML block of each section as "_html"
+    curves = True adds the dense IR-curves as arrays
+    backend : "process" or "thread" workers, see parallel.executor
+    """
+    workers = workers or os.cpu_count()
+    if workers == 1:
+        _init_worker(
+            cache_dir, FLAGS.n_points, timing.ENABLED, report, curves, FLAGS.curve_tol
+        )
+        yield from map(analyse, sections)
+        return
+
+    chunksize = max(1, len(sections) // (4 * workers))
+    with executor(
+        backend,
+        workers,
+        initializer=_init_worker,
+        initargs=(
+            cache_dir,
+            FLAGS.n_points,
+            timing.ENABLED,
+            report,
+            curves,
+            FLAGS.curve_tol,
+        ),
+    ) as pool:
+        yield from pool.map(analyse, sections, chunksize=chunksize)
+
+
+def run(sections, workers=0, cache_dir=None):
+    return list(iter_run(sections, workers, cache_dir))
+
+
+def main(argv):
+    timing.enable(FLAGS.timing or FLAGS.timing_output is not None)
+
+    sections = read_sections(FLAGS.input)
+    print(f"[INFO] {len(sections)} sections from {FLAGS.input}")
+
+    report = None
+    if FLAGS.report:
+        report = HTMLReport(
+            FLAGS.report,
+            "Column Report",
+            max_bytes=FLAGS.report_max_mb * 2**20,
+            max_sections=FLAGS.report_max_sections,
+        )
+
+    # Results with the dense curves go to the store as they arrive
+    store = ResultWriter(FLAGS.store) if FLAGS.store else None
+
+    # Report blocks are written as results arrive and then dropped
+    results, failed = [], 0
+    with timing.stage("batch run"):
+        for result in iter_run(
+            sections,
+            FLAGS.workers,
+            FLAGS.cache_dir,
+            report is not None,
+            FLAGS.backend,
+            store is not None,
+        ):
+            if "_timing" in result:
+                timing.merge(result.pop("_timing"))
+            block = result.pop("_html", None)
+            if block is not None:
+                report.write(block)
+            failed += "error" in result
+            if store is None:
+                results.append(result)
+            else:
+                store.append(result)
+
+    with timing.stage("write results"):
+        if store is None:
+            write_results(FLAGS.output, results)
+        else:
+            store.close()
+
+    print(f"[INFO] Results written to {FLAGS.store or FLAGS.output}, {failed} failed")
+
+    if report is not None:
+        report.close()
+        print(f"[INFO] Report written to {', '.join(report.pages)}")
+
+    if FLAGS.timing:
+        timing.summary()
+    if FLAGS.timing_output:
+        timing.to_json(FLAGS.timing_output)
+
+
+if __name__ == "__main__":
+    flags.mark_flag_as_required("input")
+    app.run(main)
+
+"""
+python app/batch.py --input=sections.csv --output=results.csv --workers=8
+
+sections.csv
+id,section,b,h,dia,main_dia,traverse_dia,bottom_layers,top_layers,middle_rebars,N,stirrup,Pu,Mux,Muy
+C1,rect,30,50,,20,9,3 2,3,2,,tie,2500,120,25
+C2,circle,,,60,20,9,,,,10,spiral,2500,120,25
+
+sections.json
+[{"id": "W1", "section": "polygon", "main_dia": 20, "traverse_dia": 9,
+  "outline": [[0, 0], [60, 0], [60, 20], [20, 20], [20, 60], [0, 60]],
+  "bars": [[6, 6], [30, 6], [54, 6], [54, 14], [6, 30], [6, 54], [14, 54]],
+  "Pu": 800, "Mux": 60, "Muy": 40}]
+"""
@@ -0,0 +1,294 @@
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from absl import app, flags
+from absl.flags import FLAGS
+
+from plot_rect import create_plot, create_html
+from utils import get_rebar_coordinates, calculate_areas_in_rect, display_table
+from column import Column
+import batch
+from pipeline import section_pipeline
+
+flags.DEFINE_string("bench_output", "benchmark.json", "results, .json")
+flags.DEFINE_string("compare", None, "previous results .json to compare with")
+flags.DEFINE_integer("repeat", 5, "runs of each benchmark, best is reported")
+flags.DEFINE_list("html_sections", ["1", "10", "50"], "sections in create_html")
+flags.DEFINE_bool("cli", True, "time rect.py / circular.py end to end")
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# (b, h, bottom_layers, top_layers, middle_rebars), cm
+RECT_SECTIONS = [
+    (30, 50, [3, 2], [3], 2),
+    (50, 80, [5, 5], [5, 5], 6),
+    (80, 120, [8, 8, 8], [8, 8, 8], 10),
+]
+
+# (dia, N), cm
+CIRCLE_SECTIONS = [(40, 8), (60, 12), (100, 24)]
+
+MAIN_DIA, TRAVERSE_DIA = 20, 9  # mm
+
+
+def rect_row(b, h, bottom_layers, top_layers, middle_rebars):
+    return batch.DEFAULTS | {
+        "id": f"{b}x{h}",
+        "section": "rect",
+        "b": b,
+        "h": h,
+        "main_dia": MAIN_DIA,
+        "traverse_dia": TRAVERSE_DIA,
+        "bottom_layers": " ".join(map(str, bottom_layers)),
+        "top_layers": " ".join(map(str, top_layers)),
+        "middle_rebars": middle_rebars,
+    }
+
+
+def circle_row(dia, N):
+    return batch.DEFAULTS | {
+        "id": f"D{dia}",
+        "section": "circle",
+        "dia": dia,
+        "N": N,
+        "main_dia": MAIN_DIA,
+        "traverse_dia": TRAVERSE_DIA,
+        "stirrup": "spiral",
+    }
+
+
+def rect_column(b, h, bottom_layers, top_layers, middle_rebars):
+    rebars = get_rebar_coordinates(
+        b,
+        h,
+        4,
+        MAIN_DIA / 10,
+        TRAVERSE_DIA / 10,
+        bottom_layers,
+        top_layers,
+        middle_rebars,
+    )
+    Ag, Ast, An = calculate_areas_in_rect(b, h, MAIN_DIA / 10, len(rebars))
+    column = Column(23.5, 235, 395, 200000, b, h, "rect", "tie")
+    column.initialize(MAIN_DIA / 10, TRAVERSE_DIA / 10, Ast, An, Ag)
+    return column, rebars
+
+
+# Best and mean of repeated runs, console output discarded
+def timeit(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - start)
+    return {"best_s": min(times), "mean_s": float(np.mean(times)), "repeat": repeat}
+
+
+# ----------------------------------------------------------------
+## Benchmarks, each yields (name, params, function)
+# ----------------------------------------------------------------
+def rect_benchmarks():
+    for section in RECT_SECTIONS:
+        b, h, bottom_layers, top_layers, middle_rebars = section
+        params = {
+            "b": b,
+            "h": h,
+            "bars": sum(bottom_layers + top_layers) + middle_rebars,
+        }
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            column, rebars = rect_column(*section)
+        c = column.d / 2
+
+        yield "get_rebar_coordinates", params, lambda s=section: get_rebar_coordinates(
+            s[0], s[1], 4, MAIN_DIA / 10, TRAVERSE_DIA / 10, *s[2:]
+        )
+        yield "PnMn_calculation", params, lambda col=column, rebars=rebars, c=c: (
+            col.PnMn_calculation(c, col.β1 * c, MAIN_DIA, rebars)
+        )
+        yield "PnMn_curve_200", params, lambda col=column, rebars=rebars: (
+            col.PnMn_curve(np.linspace(col.d2, col.d, 200), MAIN_DIA, rebars["z"])
+        )
+        yield "pure_bending", params, lambda col=column, rebars=rebars: (
+            col.pure_bending(MAIN_DIA, rebars)
+        )
+        yield "ir_diagram_rect", params, lambda s=section: batch.row_capacity(
+            rect_row(*s)
+        )
+
+        # Design iteration, one input changed on a warm pipeline
+        p = section_pipeline(**rect_row(*section))
+        p["checks"]
+        yield "pipeline_new_loads", params, lambda p=p: (
+            p.set(Pu=p.params["Pu"] + 1),
+            p["checks"],
+        )
+        yield "pipeline_new_fc", params, lambda p=p: (
+            p.set(fc=p.params["fc"] + 0.5),
+            p["checks"],
+        )
+
+
+def circle_benchmarks():
+    for dia, N in CIRCLE_SECTIONS:
+        params = {"dia": dia, "bars": N}
+        yield "ir_diagram_circle", params, lambda d=dia, n=N: batch.row_capacity(
+            circle_row(d, n)
+        )
+
+
+def html_benchmarks():
+    b, h, bottom_layers, top_layers, middle_rebars = RECT_SECTIONS[0]
+    with contextlib.redirect_stdout(io.StringIO()):
+        capacity = batch.row_capacity(rect_row(*RECT_SECTIONS[0]))
+
+    def write_html(n):
+        figures = [
+            create_plot(
+                b,
+                h,
+                4,
+                TRAVERSE_DIA,
+                MAIN_DIA,
+                bottom_layers,
+                top_layers,
+                middle_rebars,
+                capacity["curve_Mn_x"],
+                capacity["curve_Pn_x"],
+                capacity["curve_Mn_y"],
+                capacity["curve_Pn_y"],
+                0,
+                0,
+                0,
+            )
+            for _ in range(n)
+        ]
+        create_html([f[0] for f in figures], [f[1] for f in figures])
+
+    for n in map(int, FLAGS.html_sections):
+        yield "create_html", {"sections": n}, lambda n=n: write_html(n)
+
+
+# rect.py / circular.py as the user runs them, interpreter startup included
+def cli_benchmarks():
+    b, h, bottom_layers, top_layers, middle_rebars = RECT_SECTIONS[0]
+    rect_input = (
+        f"{MAIN_DIA}\n{TRAVERSE_DIA}\n"
+        f"{' '.join(map(str, bottom_layers))}\n{' '.join(map(str, top_layers))}\n"
+        f"{middle_rebars}\nY\nN\n"
+    )
+    dia, N = CIRCLE_SECTIONS[0]
+    circle_input = f"{dia}\n{MAIN_DIA}\n{N}\n{TRAVERSE_DIA}\nS\nY\nN\n"
+
+    def run(script, args, stdin):
+        subprocess.run(
+            [sys.executable, os.path.join(APP_DIR, script), *args],
+            input=stdin,
+            text=True,
+            capture_output=True,
+            check=True,
+        )
+
+    yield "cli_rect", {"b": b, "h": h}, lambda: run(
+        "rect.py", [f"--b={b}", f"--h={h}", "--Pu=500", "--Mux=50"], rect_input
+    )
+    yield "cli_circular", {"dia": dia, "bars": N}, lambda: run(
+        "circular.py", ["--Pu=500", "--Mux=50"], circle_input
+    )
+
+
+# ----------------------------------------------------------------
+## Report
+# ----------------------------------------------------------------
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=APP_DIR,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+    except OSError:
+        return None
+
+
+def result_key(result):
+    return result["name"], json.dumps(result["params"], sort_keys=True)
+
+
+def compare(results, path):
+    with open(path) as f:
+        previous = {result_key(r): r for r in json.load(f)["results"]}
+
+    rows = []
+    for r in results:
+        old = previous.get(result_key(r))
+        rows.append(
+            {
+                "benchmark": r["name"],
+                "params": json.dumps(r["params"]),
+                "before, ms": old["best_s"] * 1e3 if old else np.nan,
+                "after, ms": r["best_s"] * 1e3,
+                "speedup": old["best_s"] / r["best_s"] if old else np.nan,
+            }
+        )
+    display_table(pd.DataFrame(rows))
+
+
+def main(argv):
+    groups = [rect_benchmarks, circle_benchmarks, html_benchmarks]
+    if FLAGS.cli:
+        groups.append(cli_benchmarks)
+
+    results = []
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)  # create_html and the CLIs write their report here
+        try:
+            for group in groups:
+                for name, params, fn in group():
+                    repeat = 1 if name.startswith("cli") else FLAGS.repeat
+                    result = {"name": name, "params": params, **timeit(fn, repeat)}
+                    results.append(result)
+                    print(f"{name} {params}: {result['best_s'] * 1e3:.2f} ms")
+        finally:
+            os.chdir(cwd)
+
+    report = {
+        "meta": {
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+        },
+        "results": results,
+    }
+    with open(FLAGS.bench_output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"[INFO] Results written to {FLAGS.bench_output}")
+
+    if FLAGS.compare:
+        compare(results, FLAGS.compare)
+
+
+if __name__ == "__main__":
+    app.run(main)
+
+"""
+python app/benchmark.py --bench_output=before.json
+python app/benchmark.py --bench_output=after.json --compare=before.json
+"""
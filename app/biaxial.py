@@ -0,0 +1,114 @@
+import numpy as np
+
+import fiber
+import timing
+from utils import bracketed_root, section_clip, section_area_centroid
+
+# Default nuetral axis depths at each angle, from pure bending (0) to zero
+# tension (1), the part of the IR-diagram between its straight segments
+DEPTH_RATIOS = np.linspace(0, 1, 50)
+
+
+# ----------------------------------------------------------------
+## P-Mx-My interaction surface
+# ----------------------------------------------------------------
+@timing.timed("biaxial surface")
+def interaction_surface(
+    column, x, y, main_dia, Ast, An, angles=36, depths=DEPTH_RATIOS
+):
+    """
+    column : initialized Column of rect or polygon section on the X-X axis
+        (b = width, h = depth), its concrete model ("whitney" or "fiber")
+        is used for the concrete
+    x, y : rebar coordinates in the frame of the outline, cm
+    main_dia : rebar diameter, mm
+    Ast, An : rebar and net concrete area as the IR-curve, cm2
+    angles : number of nuetral axis angles over 360°, or array of angles (rad)
+        angle 0 compresses the top edge (Mx), 90° the right edge (My)
+    depths : array of nuetral axis depths from pure bending (0) to zero
+        tension (1) at each angle
+
+    Returns 𝜙Pn (kN, compression positive), 𝜙Mnx and 𝜙Mny (kN-m) meshes
+    of shape (angles, depths + 2). The first and last columns are the pure
+    tension and pure compression apexes (capped at 𝜙Pn_max), closed by
+    straight segments as the IR-diagram.
+
+    Moments are about the centroid of the section as Column.PnMn_curve, so
+    angle 0 is the X-X IR-curve and 90° the Y-Y IR-curve of the swapped
+    section.
+    """
+    if np.isscalar(angles):
+        angles = np.linspace(0, 2 * np.pi, int(angles), endpoint=False)
+    angles = np.asarray(angles, dtype=float)
+    depths = np.asarray(depths, dtype=float)
+
+    vertices, holes = column.outline()
+    _, xc, yc = section_area_centroid(vertices, holes)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+
+    # Unit normal toward compression side for each angle, (angles, 1, 2)
+    n = np.stack([np.sin(angles), np.cos(angles)], axis=-1)[:, None, :]
+
+    # Extreme compression fiber and extent of the section at each angle
+    t = vertices @ n[:, 0, :].T  # (vertices, angles)
+    t_max = t.max(axis=0)[:, None]
+    extent = t_max - t.min(axis=0)[:, None]
+
+    # Distance of each rebar from the extreme fiber, (bars, angles, 1)
+    t_bars = x[:, None] * np.sin(angles) + y[:, None] * np.cos(angles)
+    z = t_max[None, :, :] - t_bars[:, :, None]
+
+    # Effective depth keeps the cover of the X-X axis
+    d = extent - (column.h - column.d)
+
+    if column.concrete == "fiber":
+        fx, fy, _, farea = column.fibers()
+        t_fibers = fx[:, None] * np.sin(angles) + fy[:, None] * np.cos(angles)
+        z_fibers = t_max[None, :, :] - t_fibers[:, :, None]
+
+    # 𝜙Pn, 𝜙Mnx, 𝜙Mny at depths c (cm) of shape (angles, k)
+    def forces(c):
+        if column.concrete == "fiber":
+            # Concrete fibers, (fibers, angles, k)
+            Cc, _, F = fiber.concrete_force(z_fibers, farea, c, column.fc, 0)
+            Mcx = (F * (fy[:, None, None] - yc)).sum(axis=0)
+            Mcy = (F * (fx[:, None, None] - xc)).sum(axis=0)
+        else:
+            # Concrete block
+            a = np.minimum(column.β1 * c, extent)
+            area, cx, cy = section_clip(vertices, holes, n, t_max - a)
+            Cc = -0.85 * column.fc * area * 1e2 * 1e-3  # kN
+            Mcx, Mcy = Cc * (cy - yc), Cc * (cx - xc)
+
+        # Rebars
+        _, Fs, Cs, Ts, _ = column.rebar_response(z, c, main_dia)
+
+        Pn = Cc + Cs + Ts
+        Mnx = -(Mcx + (Fs * (y[:, None, None] - yc)).sum(axis=0)) * 1e-2
+        Mny = -(Mcy + (Fs * (x[:, None, None] - xc)).sum(axis=0)) * 1e-2
+
+        𝜙c = column.phi(c, d)
+        return -𝜙c * Pn, 𝜙c * Mnx, 𝜙c * Mny
+
+    # Pure bending at each angle, tension at a shallow block
+    c_pb = bracketed_root(
+        lambda c: forces(c[:, None])[0][:, 0], 1e-3 * extent[:, 0], d[:, 0]
+    )
+    if np.isnan(c_pb).any():
+        raise ValueError("Pure bending: 𝜙Pn = 0 is not between c = 0 and c = d")
+
+    c = c_pb[:, None] + depths[None, :] * (d - c_pb[:, None])  # (angles, depths)
+    𝜙Pn, 𝜙Mnx, 𝜙Mny = forces(c)
+
+    # Apexes of pure tension and pure compression
+    𝜙Pn_pc, 𝜙Pn_max = column.pure_compression(Ast, An)
+    𝜙Pn_pt = column.pure_tension(Ast * 1e2)
+    apex = np.ones((len(angles), 1))
+    top = min(abs(𝜙Pn_pc), abs(𝜙Pn_max))
+
+    return (
+        np.hstack([𝜙Pn_pt * apex, 𝜙Pn, top * apex]),
+        np.hstack([0 * apex, 𝜙Mnx, 0 * apex]),
+        np.hstack([0 * apex, 𝜙Mny, 0 * apex]),
+    )
@@ -0,0 +1,168 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+import timing
+
+# Bump when the analysis changes so old cached curves are not reused
+CACHE_VERSION = 6
+
+
+# ----------------------------------------------------------------
+## Section fingerprint
+# ----------------------------------------------------------------
+def _normalize(value):
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [_normalize(v) for v in value]
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return round(float(value), 9)
+    return value
+
+
+def section_key(**params):
+    """
+    Content hash of everything the capacity depends on, e.g. section, b, h,
+    fc, fy, Es, covering, rebar layout and stirrup. Loads must not be passed.
+    """
+    params = {k: _normalize(v) for k, v in params.items() if v is not None}
+    params["version"] = CACHE_VERSION
+    text = json.dumps(params, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+# ----------------------------------------------------------------
+## Two tier cache of computed curves and surfaces
+# ----------------------------------------------------------------
+def _read_only(arrays):
+    for value in arrays.values():
+        value.setflags(write=False)
+    return arrays
+
+
+class CurveCache:
+    """
+    In-memory LRU of dict of arrays, backed by .npz files in cache_dir.
+    The disk tier is evicted, least recently used first, when the files
+    exceed max_bytes. cache_dir = None keeps the memory tier only.
+    Arrays are returned read-only, as they are shared by every reader.
+    """
+
+    def __init__(self, cache_dir=None, max_items=256, max_bytes=512 * 2**20):
+        self.cache_dir = cache_dir
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.disk_bytes = None  # size of the files, scanned on first put
+
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npz")
+
+    def get(self, key):
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                self.hits += 1
+                timing.count("cache hits")
+                return self.memory[key]
+
+        arrays = None
+        if self.cache_dir:
+            path = self._path(key)
+            try:
+                with np.load(path) as npz:
+                    arrays = _read_only({name: npz[name] for name in npz.files})
+                os.utime(path)  # mark as recently used
+            except (FileNotFoundError, OSError, ValueError):
+                arrays = None
+
+        with self.lock:
+            if arrays is None:
+                self.misses += 1
+                timing.count("cache misses")
+                return None
+            self.hits += 1
+            timing.count("cache hits")
+            self._remember(key, arrays)
+        return arrays
+
+    # Returns the arrays as cached, own read-only copies
+    def put(self, key, arrays):
+        arrays = _read_only({name: np.array(v) for name, v in arrays.items()})
+        with self.lock:
+            self._remember(key, arrays)
+
+        if self.cache_dir:
+            # Write then rename, so readers in other processes never see half a file
+            tmp = f"{self._path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                np.savez(f, **arrays)
+            size = os.path.getsize(tmp)
+            os.replace(tmp, self._path(key))
+
+            # Files of other processes are only counted when the files are
+            # scanned, on the first put and on each eviction
+            with self.lock:
+                if self.disk_bytes is not None:
+                    self.disk_bytes += size
+                over = self.disk_bytes is None or self.disk_bytes > self.max_bytes
+            if over:
+                self.evict()
+        return arrays
+
+    def get_or_compute(self, key, compute):
+        arrays = self.get(key)
+        if arrays is None:
+            arrays = self.put(key, compute())
+        return arrays
+
+    def _remember(self, key, arrays):
+        self.memory[key] = arrays
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_items:
+            self.memory.popitem(last=False)
+
+    # Remove least recently used files until the disk tier fits 90% of
+    # max_bytes, so puts write a tenth of it before the next scan
+    def evict(self):
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(".npz"):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= 0.9 * self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+        with self.lock:
+            self.disk_bytes = total
+
+    def clear(self):
+        with self.lock:
+            self.memory.clear()
+            self.disk_bytes = None
+        if self.cache_dir:
+            for entry in os.scandir(self.cache_dir):
+                if entry.name.endswith(".npz"):
+                    os.remove(entry.path)
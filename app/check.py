@@ -0,0 +1,182 @@
+import numpy as np
+
+import timing
+
+
+# ----------------------------------------------------------------
+## Capacity surface facets
+# ----------------------------------------------------------------
+def surface_facets(Pn, Mnx, Mny):
+    """
+    Pn, Mnx, Mny : (angles, depths) meshes from biaxial.interaction_surface
+
+    Returns (facets, 3, 3) triangles of (Pu, Mux, Muy), the angle axis is
+    closed around and both depth ends are capped with a fan. Facets of no
+    area are left out.
+    """
+    mesh = np.stack([Pn, Mnx, Mny], axis=-1)  # (angles, depths, 3)
+    nxt = np.roll(mesh, -1, axis=0)
+
+    # Two triangles for each quad between neighbour angles and depths
+    p00, p01 = mesh[:, :-1], mesh[:, 1:]
+    p10, p11 = nxt[:, :-1], nxt[:, 1:]
+    quads = np.concatenate(
+        [
+            np.stack([p00, p10, p11], axis=-2).reshape(-1, 3, 3),
+            np.stack([p00, p11, p01], axis=-2).reshape(-1, 3, 3),
+        ]
+    )
+
+    # Fans closing pure tension and pure compression ends
+    caps = []
+    for j in (0, -1):
+        ring, ring_next = mesh[:, j], nxt[:, j]
+        center = np.broadcast_to(ring.mean(axis=0), ring.shape)
+        caps.append(np.stack([center, ring, ring_next], axis=-2))
+
+    # Zero-area facets of collapsed rings (e.g. an apex) hit nothing
+    facets = np.concatenate([quads, *caps])
+    scale = np.abs(facets).reshape(-1, 3).max(axis=0)
+    scale[scale == 0] = 1
+    v = facets / scale
+    area = np.linalg.norm(np.cross(v[:, 1] - v[:, 0], v[:, 2] - v[:, 0]), axis=-1)
+    return facets[area > 1e-12]
+
+
+# Hit distance t of rays from the origin along d, inf where missed
+def _ray_hits(d, v0, v1, v2):
+    e1, e2 = v1 - v0, v2 - v0
+    pvec = np.cross(d, e2)
+    det = (e1 * pvec).sum(axis=-1)
+    tvec = -v0
+    qvec = np.cross(tvec, e1)
+
+    eps = 1e-9
+    with np.errstate(divide="ignore", invalid="ignore"):
+        u = (tvec * pvec).sum(axis=-1) / det
+        v = (d * qvec).sum(axis=-1) / det
+        t = (e2 * qvec).sum(axis=-1) / det
+        hit = (u >= -eps) & (v >= -eps) & (u + v <= 1 + eps) & (t > 0)
+
+    return np.where(hit, t, np.inf)
+
+
+# ----------------------------------------------------------------
+## Spatial index over facet directions
+# ----------------------------------------------------------------
+class FacetIndex:
+    """
+    Bins facets by the latitude/longitude of their directions seen from the
+    origin, so each demand ray only tests the facets of its own bin.
+    """
+
+    def __init__(self, facets, n_lon=72, n_lat=36):
+        self.n_lon = n_lon
+        self.n_lat = n_lat
+
+        # Scale P and M to similar size so the bins are well balanced
+        self.scale = np.abs(facets).reshape(-1, 3).max(axis=0)
+        self.scale[self.scale == 0] = 1
+        self.facets = facets / self.scale
+
+        lat, lon = self._direction(self.facets)  # (facets, 3)
+
+        # Latitude range, padded by one bin for edges bulging between vertices
+        lat0 = np.clip(self._lat_bin(lat.min(axis=1)) - 1, 0, n_lat - 1)
+        lat1 = np.clip(self._lat_bin(lat.max(axis=1)) + 1, 0, n_lat - 1)
+
+        # Longitude range, unwrapped when the facet crosses ±180°
+        span = lon.max(axis=1) - lon.min(axis=1)
+        lon = np.where((span > np.pi)[:, None] & (lon < 0), lon + 2 * np.pi, lon)
+        lon0 = self._lon_bin(lon.min(axis=1)) - 1
+        n_lons = self._lon_bin(lon.max(axis=1)) + 1 - lon0 + 1
+
+        # Facets near the P axis see every longitude
+        polar = np.abs(lat).max(axis=1) > np.radians(75)
+        lon0 = np.where(polar, 0, lon0)
+        n_lons = np.where(polar, n_lon, np.minimum(n_lons, n_lon))
+
+        # (bin, facet) pairs sorted into CSR layout
+        n_lats = lat1 - lat0 + 1
+        facet_id, offset = self._expand(n_lats * n_lons)
+        lat_bin = lat0[facet_id] + offset // n_lons[facet_id]
+        lon_bin = (lon0[facet_id] + offset % n_lons[facet_id]) % n_lon
+        bins = lat_bin * n_lon + lon_bin
+
+        order = np.argsort(bins, kind="stable")
+        self.facet_ids = facet_id[order]
+        self.starts = np.searchsorted(bins[order], np.arange(n_lat * n_lon + 1))
+
+    @staticmethod
+    def _direction(p):
+        r = np.linalg.norm(p, axis=-1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            lat = np.arcsin(np.clip(np.where(r > 0, p[..., 0] / r, 0), -1, 1))
+        lon = np.arctan2(p[..., 2], p[..., 1])
+        return lat, lon
+
+    # Repeat ids by counts with the running offset inside each group
+    @staticmethod
+    def _expand(counts):
+        ids = np.repeat(np.arange(len(counts)), counts)
+        first = np.cumsum(counts) - counts
+        return ids, np.arange(counts.sum()) - first[ids]
+
+    def _lat_bin(self, lat):
+        return np.clip(
+            ((lat + np.pi / 2) / np.pi * self.n_lat).astype(int), 0, self.n_lat - 1
+        )
+
+    def _lon_bin(self, lon):
+        return np.floor((lon + np.pi) / (2 * np.pi) * self.n_lon).astype(int)
+
+    # Distance to the surface along each ray, as multiple of the demand,
+    # nan for a demand that is not finite
+    def ray_cast(self, demands):
+        d = np.asarray(demands, dtype=float).reshape(-1, 3) / self.scale
+        finite = np.isfinite(d).all(axis=1)
+        d = np.where(finite[:, None], d, 0)
+        t_min = np.full(len(d), np.inf)
+
+        lat, lon = self._direction(d)
+        bins = self._lat_bin(lat) * self.n_lon + self._lon_bin(lon) % self.n_lon
+        counts = self.starts[bins + 1] - self.starts[bins]
+
+        ray, offset = self._expand(counts)
+        facet = self.facet_ids[self.starts[bins][ray] + offset]
+        v = self.facets[facet]
+        np.minimum.at(t_min, ray, _ray_hits(d[ray], v[:, 0], v[:, 1], v[:, 2]))
+
+        # Rays lost between bins fall back to all facets, in one batch
+        lost = np.flatnonzero(np.isinf(t_min) & (np.abs(d).sum(axis=1) > 0))
+        if len(lost):
+            v = self.facets[None]
+            t = _ray_hits(d[lost, None], v[..., 0, :], v[..., 1, :], v[..., 2, :])
+            t_min[lost] = t.min(axis=1)
+
+        return np.where(finite, t_min, np.nan)
+
+
+# ----------------------------------------------------------------
+## Demand / Capacity ratio
+# ----------------------------------------------------------------
+@timing.timed("demand checks")
+def demand_capacity(demands, surface=None, index=None):
+    """
+    demands : (N, 3) array of (Pu kN, Mux kN-m, Muy kN-m), compression positive
+    surface : (𝜙Pn, 𝜙Mnx, 𝜙Mny) meshes from biaxial.interaction_surface
+    index : FacetIndex to reuse across calls, built from surface if None
+
+    Returns D/C ratio of each row, the demand scaled along the ray from the
+    origin reaches the surface at 1 / ratio. Ratio > 1 is not OK.
+    """
+    if index is None:
+        index = FacetIndex(surface_facets(*surface))
+
+    demands = np.asarray(demands, dtype=float).reshape(-1, 3)
+    t = index.ray_cast(demands)
+
+    # Zero demand is 0, a ray missing the surface is inf, nan demand is nan
+    ratio = 1 / t
+    ratio[np.isinf(t) & (np.abs(demands).sum(axis=1) > 0)] = np.inf
+    return ratio
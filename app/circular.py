@@ -5,10 +5,11 @@ from absl import app, flags, logging
 from absl.flags import FLAGS
 
 
-from utils import get_valid_integer, calculate_areas, display_table
-from plot_circular import create_plot, create_html
+from utils import get_valid_integer, calculate_areas, display_table, information
 from column import Column
-
+import timing
+from parallel import BACKENDS, run_ordered
+from report import section_block
 
 flags.DEFINE_float("fc", 24, "240ksc, MPa")
 flags.DEFINE_integer("fy", 395, "SD40 main bar, MPa")
@@ -19,59 +20,18 @@ flags.DEFINE_float("c", 4, "concrete covering, cm")
 flags.DEFINE_float("Pu", 0, "Axial force, kN")
 flags.DEFINE_float("Mux", 0, "Mux, kN-m")
 flags.DEFINE_float("Muy", 0, "Mux, kN-m")
-
-
-def information(section_dia, covering, main_dia, traverse_dia, N):
-    # Calculate the inner diameter
-    inner_dia = (
-        section_dia - 2 * covering - main_dia - traverse_dia
-    )  # for main reinforcements
-    inner_dia2 = section_dia - 2 * covering  # for covering
-    inner_dia3 = section_dia - 2 * covering - 2 * traverse_dia  # for traverse
-
-    # Create the solid circle for the column section
-    theta = np.linspace(0, 2 * np.pi, 100)
-    x_outer = (section_dia / 2) * np.cos(theta)
-    y_outer = (section_dia / 2) * np.sin(theta)
-
-    # Create the dotted circle for the covering
-    x_inner = (inner_dia2 / 2) * np.cos(theta)
-    y_inner = (inner_dia2 / 2) * np.sin(theta)
-
-    # Create the dotted circle for the traverse
-    x_traverse = (inner_dia3 / 2) * np.cos(theta)
-    y_traverse = (inner_dia3 / 2) * np.sin(theta)
-
-    # Create the positions for the rebars
-    theta_rebar = np.linspace(0.5 * np.pi, 2.5 * np.pi, N, endpoint=False)
-    # theta_rebar = np.linspace(0, 2 * np.pi, N, endpoint=False)
-    x_rebar = (inner_dia / 2) * np.cos(theta_rebar)
-    y_rebar = (inner_dia / 2) * np.sin(theta_rebar)
-
-    # Calculate distance from top of the column to each rebar
-    distance_from_top = (section_dia / 2) - y_rebar
-
-    # Create a DataFrame for the rebars
-    rebar_data = {
-        "No": list(range(1, N + 1)),
-        "x": x_rebar,
-        "y": y_rebar,
-        "z": distance_from_top,
-    }
-
-    context = {
-        "x_outer": x_outer,
-        "y_outer": y_outer,
-        "x_inner": x_inner,
-        "y_inner": y_inner,
-        "x_traverse": x_traverse,
-        "y_traverse": y_traverse,
-        "x_rebar": x_rebar,
-        "y_rebar": y_rebar,
-        "rebar_data": rebar_data,
-    }
-
-    return context
+flags.DEFINE_integer("n_points", 200, "points on IR-diagram curve")
+flags.DEFINE_float(
+    "curve_tol", None, "adaptive IR-diagram curve, e.g. 1e-3 of its size"
+)
+flags.DEFINE_enum("concrete", "whitney", ["whitney", "fiber"], "concrete model")
+flags.DEFINE_integer("mesh", 20, "fiber mesh, n x n rect, n rings x 4n sectors circle")
+flags.DEFINE_bool("timing", False, "print per-stage timing summary")
+flags.DEFINE_string("timing_output", None, "write per-stage timing as .json")
+flags.DEFINE_float("report_max_mb", 50, "start a new report page past this size, MB")
+flags.DEFINE_integer("report_max_sections", None, "sections per report page")
+flags.DEFINE_integer("workers", 1, "sections run concurrently, 0 = all cores")
+flags.DEFINE_enum("backend", "process", BACKENDS, "executor of workers")
 
 
 def create_ir_diagram(section_dia, main_dia, N, traverse_dia, stirrup_type):
@@ -98,16 +58,18 @@ def create_ir_diagram(section_dia, main_dia, N, traverse_dia, stirrup_type):
         h=section_dia,
         section="circle",
         stirrup=stirrup_type,
+        concrete=FLAGS.concrete,
+        mesh=FLAGS.mesh,
     )
     column.initialize(main_dia / 10, traverse_dia / 10, Ast, An, Ag)
     column.traverse(An, Ag, main_dia / 10, traverse_dia / 10)
 
     # Get rebars coordinates
     data = information(section_dia, covering, main_dia / 10, traverse_dia / 10, N)
-    df_rebars = pd.DataFrame(data["rebar_data"])
+    rebars = data["rebars"]
 
     print(f"\n[INFO] Rebars coodinates(x, y) and distance from top edge(z), cm ")
-    # display_table(df_rebars)
+    # display_table(rebars)
 
     # Initialized
     neutral_axis = []
@@ -120,21 +82,21 @@ def create_ir_diagram(section_dia, main_dia, N, traverse_dia, stirrup_type):
     x_ir.append(0)
 
     ## 2-Zero Tension
-    𝜙Pn, 𝜙Mn, c = column.zero_tension(main_dia, df_rebars)
+    𝜙Pn, 𝜙Mn, c = column.zero_tension(main_dia, rebars)
 
     y_ir.append(abs(𝜙Pn))
     x_ir.append(𝜙Mn)
     neutral_axis.append(c)
 
     ## 3-Balance
-    𝜙Pn, 𝜙Mn, c = column.balance(main_dia, df_rebars)
+    𝜙Pn, 𝜙Mn, c = column.balance(main_dia, rebars)
 
     y_ir.append(abs(𝜙Pn))
     x_ir.append(𝜙Mn)
     neutral_axis.append(c)
 
     ## 4-Pure Bending
-    𝜙Pn, 𝜙Mn, c = column.pure_bending(main_dia, df_rebars)
+    𝜙Pn, 𝜙Mn, c = column.pure_bending(main_dia, rebars)
 
     y_ir.append(0)
     x_ir.append(𝜙Mn)
@@ -147,7 +109,7 @@ def create_ir_diagram(section_dia, main_dia, N, traverse_dia, stirrup_type):
 
     # # Total area of the rebars (Ast)
     # Ast = Ast_single * N
-    𝜙Pn = column.pure_tension(Ast)
+    𝜙Pn = column.pure_tension(Ast * 1e2)
 
     y_ir.append(𝜙Pn)
     x_ir.append(0)
@@ -170,6 +132,25 @@ def create_ir_diagram(section_dia, main_dia, N, traverse_dia, stirrup_type):
     print(f"𝜙Pn_max = {abs(𝜙Pn_max):.2f} kN")
     display_table(df)
 
+    𝜙Mn, c = column.capacity_at(Pu, main_dia, rebars["z"], Ast, An)
+    print(f"𝜙Mn at Pu = {Pu:.2f} kN : {𝜙Mn:.2f} kN-m, Mu = {Mu:.2f} kN-m")
+
+    ## Dense curve between zero tension and pure bending
+    _, 𝜙Pn, 𝜙Mn = column.dense_curve(
+        neutral_axis[0],
+        neutral_axis[-1],
+        main_dia,
+        rebars["z"],
+        FLAGS.n_points,
+        FLAGS.curve_tol,
+        neutral_axis,
+    )
+
+    x_ir = [x_ir[0], *𝜙Mn, x_ir[-1]]
+    y_ir = [y_ir[0], *-𝜙Pn, y_ir[-1]]
+
+    from plot_circular import create_plot
+
     section_fig, ir_fig = create_plot(
         section_dia / 2, section_dia, main_dia / 10, N, data, x_ir, y_ir, Pu, Mu
     )
@@ -177,7 +158,16 @@ def create_ir_diagram(section_dia, main_dia, N, traverse_dia, stirrup_type):
     return section_fig, ir_fig
 
 
+# One section of the report, for running sections concurrently
+def section_task(n, inputs, widths):
+    print(f"\n============== Section {n} ==============")
+    section_fig, ir_fig = create_ir_diagram(*inputs)
+    return section_block(section_fig, ir_fig, n, widths)
+
+
 def main(argv):
+    timing.enable(FLAGS.timing or FLAGS.timing_output is not None)
+
     print("====================== Circular Column Design ======================")
     print("[INFO] Section properties : ")
     print(
@@ -185,10 +175,16 @@ def main(argv):
     )
     print(f"Pu: {FLAGS.Pu} kN, Mux: {FLAGS.Mux} kN-m, Muy: {FLAGS.Muy} kN-m")
 
+    from plot_circular import create_report
+
     n = 1
-    section_fig = []
-    ir_fig = []
+    # Each section is written as soon as it is computed
+    report = create_report(
+        max_bytes=FLAGS.report_max_mb * 2**20, max_sections=FLAGS.report_max_sections
+    )
 
+    # With workers != 1 all sections are asked first, then run concurrently
+    sections = []
     while True:
         print(f"\n============== Section {n} ==============")
 
@@ -211,12 +207,13 @@ def main(argv):
             else:
                 pass
 
-        section, ir = create_ir_diagram(
-            section_dia, main_dia, N, traverse_dia, stirrup_type
-        )
-
-        section_fig.append(section)
-        ir_fig.append(ir)
+        inputs = (section_dia, main_dia, N, traverse_dia, stirrup_type)
+        if FLAGS.workers == 1:
+            section, ir = create_ir_diagram(*inputs)
+            report.add(section, ir)
+            del section, ir
+        else:
+            sections.append(inputs)
 
         ask = input("Any section? , Y|N : ").upper()
         if ask == "N":
@@ -224,7 +221,19 @@ def main(argv):
         else:
             n += 1
 
-    create_html(section_fig, ir_fig)
+    tasks = [(section_task, (i + 1, s, report.widths)) for i, s in enumerate(sections)]
+    for block in run_ordered(tasks, FLAGS.backend, FLAGS.workers):
+        report.write(block)
+
+    report.close()
+    print(f"Please open {report.pages[0]} in your project folder")
+    if len(report.pages) > 1:
+        print(f"[INFO] Report split into {len(report.pages)} pages")
+
+    if FLAGS.timing:
+        timing.summary()
+    if FLAGS.timing_output:
+        timing.to_json(FLAGS.timing_output)
 
     # ----------------------------------------------------------------
 
@@ -1,12 +1,46 @@
 import numpy as np
-from utils import display_table, sum_separate, segment_area_above_line
+
+import fiber
+import timing
+from utils import (
+    display_table,
+    circular_segment,
+    bracketed_root,
+    rect_vertices,
+    polygon_section,
+    section_clip,
+    section_area_centroid,
+)
 
 
 class Column:
-    def __init__(self, fc, fv, fy, Es, b, h, section, stirrup):
+    def __init__(
+        self,
+        fc,
+        fv,
+        fy,
+        Es,
+        b,
+        h,
+        section,
+        stirrup,
+        concrete="whitney",
+        mesh=20,
+        polygon=None,
+        verbose=True,
+    ):
         """
         b : column width in rect-section, section diameter in circular section
         h : column height in rect-section, section diameter in circular section
+        section : "rect", "circle" or "polygon"
+        concrete : "whitney" stress block or "fiber" section
+        mesh : fibers n x n for rect-section, n rings x 4n sectors for circle
+        polygon : (outline, holes) vertices of polygon section, cm,
+            b and h are the width and height of its bounding box
+        verbose : print the checks and tables, False for no console output
+
+        Moments are taken about the centroid of the section, z_centroid from
+        the top edge, as the P-Mx-My surface.
         """
         self.fc = fc
         self.fv = fv
@@ -16,6 +50,19 @@ class Column:
         self.h = h
         self.section = section
         self.stirrup = stirrup
+        self.concrete = concrete
+        self.mesh = mesh
+        self.verbose = verbose
+        if polygon is not None:
+            self.polygon = polygon_section(*polygon)
+        self.z_centroid = self.centroid_depth()
+
+    # Depth of the section centroid from top edge, cm
+    def centroid_depth(self):
+        if self.section == "polygon":
+            outer, holes = self.polygon
+            return outer[:, 1].max() - section_area_centroid(outer, holes)[2]
+        return self.h / 2
 
     def beta_one(self):
         if self.fc <= 30:  # N/mm2(MPa)
@@ -30,132 +77,321 @@ class Column:
     def effective_depth(self, main_dia, traverse_dia, covering=4.5):  # cm
         self.d2 = covering + traverse_dia + main_dia / 2
         self.d = self.h - covering - traverse_dia - main_dia / 2
-        print(f"d = {self.d:.2f} cm, d' = {self.d2:.2f} cm")
+        if self.verbose:
+            print(f"d = {self.d:.2f} cm, d' = {self.d2:.2f} cm")
 
     # Percent Reinforcement
     def percent_reinforcment(self, Ast, An, Ag):
         ρg = Ast / Ag
         if 0.01 < ρg < 0.08:
-            print(f"Main reinforcement: ρg = 0.01 < {ρg:.4f} < 0.08  OK ")
+            if self.verbose:
+                print(f"Main reinforcement: ρg = 0.01 < {ρg:.4f} < 0.08  OK ")
         else:
-            print(
-                f"Main reinforcement: ρg = {ρg:.4f} out of range [0.01, 0.08]--> Used 0.01"
-            )
+            if self.verbose:
+                print(
+                    f"Main reinforcement: ρg = {ρg:.4f} out of range [0.01, 0.08]--> Used 0.01"
+                )
             ρg = 0.01
 
         self.ρg = ρg
 
+    # Returns spiral ratio ρ, or tie spacing required in cm
     def traverse(self, An, Ag, main_dia, traverse_dia):
         if self.stirrup == "spiral":
             ρ_spiral = 0.45 * (Ag / An - 1) * self.fc / self.fy
 
-            print(f"Spiral traverse: ρ = {ρ_spiral:.4f}")
-            print("Spacing : 25mm < s < 80mm")
+            if self.verbose:
+                print(f"Spiral traverse: ρ = {ρ_spiral:.4f}")
+                print("Spacing : 25mm < s < 80mm")
+            return ρ_spiral
 
         if self.stirrup == "tie":
             s = min(16 * main_dia, 48 * traverse_dia, self.b)
-            print(f"Tie traverse: spacing required = {s:.2f} cm")
+            if self.verbose:
+                print(f"Tie traverse: spacing required = {s:.2f} cm")
+            return s
 
     # Safety factor, 𝜙c
     def 𝜙x(self, c):
         """
         c : distance from top to nuetral axis
         """
+        self.𝜙c = self.phi(c)
+
+    # Safety factor for one or many nuetral axis depths
+    def phi(self, c, d=None):
+        """
+        d : effective depth, default self.d, cm
+        """
+        c = np.asarray(c, dtype=float)
+        d = self.d if d is None else d
         if self.stirrup == "tie":
-            self.𝜙c = 0.65 + 0.25 * ((1 / c / self.d) - 5 / 3)  # tie
+            return 0.65 + 0.25 * ((1 / c / d) - 5 / 3)  # tie
         else:
-            self.𝜙c = 0.75 + 0.15 * ((1 / c / self.d) - 5 / 3)  # spiral
+            return 0.75 + 0.15 * ((1 / c / d) - 5 / 3)  # spiral
 
     # Initial column section properties
+    @timing.timed("Column.initialize")
     def initialize(self, main_dia, traverse_dia, Ast, An, Ag):
         self.beta_one()
         self.effective_depth(main_dia, traverse_dia, covering=4.5)
         self.percent_reinforcment(Ast, An, Ag)
 
-    # Calculate stress for each rebar
-    def stress(self, df_rebars, c, label):
-        c = c * 10  # Convert to mm
-        stresses = []
-        for i, row in df_rebars.iterrows():
-            z = row["z"] * 10  ## Convert to mm
-            if z > c:
-                fs = 0.003 * (z - c) * self.Es / c
-            elif z < c:
-                fs = -0.003 * (c - z) * self.Es / c
-            else:
-                fs = 0
-
-            # Check if absolute stress exceeds fy
-            if abs(fs) > self.fy:
-                fs = np.sign(fs) * self.fy  # Limit stress to fy
-            stresses.append(fs)
-        df_rebars[label] = stresses
-        return df_rebars
-
-    # Calculate force for each rebar
-    def force(self, df_rebars, main_dia, stress_label, force_label):
-        rebar_area_mm2 = (
-            np.pi * (main_dia / 2) ** 2
-        )  # Cross-sectional area of rebar in mm^2
-        forces = []
-        for i, row in df_rebars.iterrows():
-            stress = row[stress_label]
-            if abs(stress) > self.fy:
-                stress = np.sign(stress) * self.fy  # Limit stress to fy
-            force = stress * rebar_area_mm2 * 1e-3  # Force in Newtons (kN)
-            forces.append(force)
-        df_rebars[force_label] = forces
-        return df_rebars
-
-    # Calculated moment of section
-    def moment(self, df_rebars, force_label):
-        neutral_axis = (self.b / 100,)
-        moment = []
-        for i, row in df_rebars.iterrows():
-            z = row["z"] / 100  # Convert to m
-            F = row[force_label]
-
-            if z < neutral_axis:
-                m = -F * (neutral_axis - z)  # counter clockwise
+    # Strain compatibility of all rebars in one array operation
+    def rebar_response(self, z, c, main_dia):
+        """
+        z : distance from top edge of each rebar, cm
+        c : distance from top to nuetral axis, cm (scalar or array of depths)
+        main_dia : rebar diameter, mm
+
+        A 1-D z is broadcast against every depth in c, a z with more
+        dimensions (e.g. one depth per angle) must broadcast with c itself.
+
+        Returns stress (MPa) and force (kN) with shape (bars, *c.shape),
+        then compression, tension and moment (kN-m) summed over the bars.
+        """
+        c = np.asarray(c, dtype=float)
+        z = np.asarray(z, dtype=float)
+        if z.ndim == 1:
+            z = z.reshape((-1,) + (1,) * c.ndim)
+
+        # Strain 0.003 at top fiber, tension positive, limit stress to fy
+        fs = np.clip(0.003 * (z - c) * self.Es / c, -self.fy, self.fy)
+
+        rebar_area_mm2 = np.pi * (main_dia / 2) ** 2
+        Fs = fs * rebar_area_mm2 * 1e-3  # kN
+
+        Cs = np.where(Fs < 0, Fs, 0).sum(axis=0)
+        Ts = np.where(Fs > 0, Fs, 0).sum(axis=0)
+
+        # Moment about the centroid, counter clockwise
+        Ms = (Fs * (z / 100 - self.z_centroid / 100)).sum(axis=0)  # kN-m
+
+        return fs, Fs, Cs, Ts, Ms
+
+    # Calculate stress for each rebar, MPa
+    def stress(self, rebars, c):
+        fs, _, _, _, _ = self.rebar_response(rebars["z"], c, 0)
+        return fs
+
+    # Calculate force for each rebar from its stress, kN
+    def force(self, stress, main_dia):
+        stress = np.clip(stress, -self.fy, self.fy)
+        rebar_area_mm2 = np.pi * (main_dia / 2) ** 2
+        return stress * rebar_area_mm2 * 1e-3
+
+    # Calculated moment of section from the rebar forces
+    def moment(self, rebars, F):
+        z = np.asarray(rebars["z"]) / 100  # Convert to m
+        return float((F * (z - self.z_centroid / 100)).sum())  # counter clockwise
+
+    # Outline and holes of rect and polygon section, counter clockwise
+    def outline(self):
+        if self.section == "polygon":
+            return self.polygon
+        return rect_vertices(self.b, self.h), []
+
+    # Concrete fibers of the section, built once
+    def fibers(self):
+        if not hasattr(self, "_fibers"):
+            if self.section == "circle":
+                self._fibers = fiber.circle_fibers(self.b, self.mesh)
             else:
-                m = F * (z - neutral_axis)  # counter clockwise
-            moment.append(m)
+                self._fibers = fiber.polygon_fibers(*self.outline(), self.mesh)
+        return self._fibers
 
-        return sum(moment)
+    # Concrete compression force and moment for one or many depths
+    def concrete_force(self, c, a=None):
+        """
+        c : distance from top to nuetral axis, cm
+        a : depth of stress block, default β1 * c, cm
 
-    # Calculate 𝜙Pn, 𝜙Mn
-    def PnMn_calculation(self, c, a, main_dia, df, stress_label, force_label):
-        if self.section == "rect":
-            compression_area = self.b * a * 1e2
-        else:
-            compression_area = segment_area_above_line(self.b, a) * 100  # mm2
+        Returns Cc (kN, compression negative) and Mc (kN-m, counter clockwise)
+        """
+        c = np.asarray(c, dtype=float)
 
-        self.𝜙x(c)  # set tie stirrup as defalt
+        if self.concrete == "fiber":
+            # Fibers at the same depth act together, sum them into strips
+            if not hasattr(self, "_strips"):
+                _, _, z, area = self.fibers()
+                z, index = np.unique(z, return_inverse=True)
+                self._strips = z, np.bincount(index, weights=area)
 
-        # Calculate stress of each rebars
-        df = self.stress(df, c, stress_label)
+            z, area = self._strips
+            Cc, Mc, _ = fiber.concrete_force(z, area, c, self.fc, self.z_centroid)
+            return Cc, Mc
 
-        # Calculate force of each rebars
-        df = self.force(df, main_dia, stress_label, force_label)
+        if a is None:
+            a = np.minimum(self.β1 * c, self.h)  # cm, block stays inside section
+
+        if self.section == "circle":
+            area, centroid = circular_segment(self.b, a)  # cm2, cm from top
+            compression_area = area * 1e2  # mm2
+        else:
+            # Rect is the polygon of its 4 corners, clipped below depth a
+            outer, holes = self.outline()
+            top = outer[:, 1].max()
+            area, _, cy = section_clip(outer, holes, np.array([0.0, 1.0]), top - a)
+            compression_area = area * 1e2  # mm2
+            centroid = top - cy  # cm from top
 
-        # Calculate axial force of section
         Cc = -0.85 * self.fc * compression_area * 1e-3  # kN
-        Cs, Ts = sum_separate(df, force_label)
+        Mc = -Cc * (self.z_centroid - centroid) * 1e-2  # counter clockwise
+        return Cc, Mc
+
+    # Calculate 𝜙Pn, 𝜙Mn
+    def PnMn_calculation(self, c, a, main_dia, rebars):
+        """
+        rebars : RebarLayout
+        Returns 𝜙Pn (kN), 𝜙Mn (kN-m), stress (MPa) and force (kN) of each rebar
+        """
+        timing.count("PnMn_calculation calls")
+
+        self.𝜙x(c)  # set tie stirrup as defalt
+
+        # Calculate stress and force of each rebars
+        fs, Fs, Cs, Ts, Ms = self.rebar_response(rebars["z"], c, main_dia)
+
+        # Calculate axial force and moment of section
+        Cc, Mc = self.concrete_force(c, a)  # kN, kN-m
 
         Pn = Cc + Cs + Ts
         𝜙Pn = self.𝜙c * Pn
+        𝜙Mn = self.𝜙c * (Ms + Mc)
+
+        return float(𝜙Pn), float(𝜙Mn), fs, Fs
+
+    # Calculate 𝜙Pn, 𝜙Mn for many nuetral axis depths in one batch
+    def PnMn_curve(self, c, main_dia, z):
+        """
+        c : array of distance from top to nuetral axis, cm
+        main_dia : rebar diameter, mm
+        z : distance from top edge of each rebar, cm
 
-        # print(Cc, Cs, Ts, Pn, 𝜙Pn)
+        Returns 𝜙Pn (kN) and 𝜙Mn (kN-m) arrays with the shape of c
+        """
+        c = np.asarray(c, dtype=float)
+        timing.count("PnMn_curve calls")
+        timing.count("PnMn_curve depths", c.size)
 
-        # Calculate moment
-        Mc = -Cc * (self.b / 2 - a / 2) * 1e-2  # counter clockwise
-        Ms = self.moment(df, force_label)  # kN-m
+        # Concrete and rebars, (bars x depths) in one operation
+        Cc, Mc = self.concrete_force(c)
+        _, _, Cs, Ts, Ms = self.rebar_response(z, c, main_dia)
 
-        𝜙Mn = self.𝜙c * (Ms + Mc)  # numpy array
+        𝜙c = self.phi(c)
+        return 𝜙c * (Cc + Cs + Ts), 𝜙c * (Ms + Mc)
 
-        return 𝜙Pn, 𝜙Mn[0], df
+    # Dense curve between two nuetral axis depths, uniform or adaptive
+    def dense_curve(
+        self, c_start, c_end, main_dia, z, n_points=200, tol=None, c_nodes=()
+    ):
+        """
+        c_start, c_end : nuetral axis depths at the ends of the curve, cm
+        n_points : depths of the uniform curve, most depths of the adaptive one
+        tol : None for n_points uniform depths, else an interval is bisected
+            only while its midpoint is further than tol from the chord of its
+            ends, tol relative to the size of the curve (e.g. 1e-3)
+        c_nodes : depths kept on the adaptive curve, e.g. control points
+
+        Returns c (cm), 𝜙Pn (kN) and 𝜙Mn (kN-m) from c_start to c_end
+        """
+        if tol is None:
+            c = np.linspace(c_start, c_end, n_points)
+            return (c, *self.PnMn_curve(c, main_dia, z))
+
+        # Coarse curve through the control points, ascending c
+        lo, hi = sorted((c_start, c_end))
+        c = np.unique(np.r_[np.linspace(lo, hi, min(33, n_points)), c_nodes])
+        c = c[(c >= lo) & (c <= hi)]
+        P, M = self.PnMn_curve(c, main_dia, z)
+        scale = np.array([np.ptp(P), np.ptp(M)])
+        scale[scale == 0] = 1
+
+        # Bisect all intervals still too far from straight, one batch per round
+        split = np.diff(c) > 1e-4  # cm, stop at steps of the curve
+        while split.any() and len(c) < n_points:
+            i = np.flatnonzero(split)[: n_points - len(c)]
+            c_mid = (c[i] + c[i + 1]) / 2
+            P_mid, M_mid = self.PnMn_curve(c_mid, main_dia, z)
+
+            # Distance of each midpoint from its chord, on the scaled curve
+            a = np.column_stack([P[i], M[i]]) / scale
+            b = np.column_stack([P[i + 1], M[i + 1]]) / scale
+            m = np.column_stack([P_mid, M_mid]) / scale
+            chord, offset = b - a, m - a
+            length = np.hypot(*chord.T)
+            cross = np.abs(chord[:, 0] * offset[:, 1] - chord[:, 1] * offset[:, 0])
+            error = np.where(length > 0, cross / np.where(length > 0, length, 1), 0)
+            error = np.maximum(error, np.where(length > 0, 0, np.hypot(*offset.T)))
+
+            # A kink between the ends can be up to twice the midpoint error
+            again = (error > tol / 2) & (c_mid - c[i] > 1e-4)
+            split[i] = again
+            split = np.insert(split, i + 1, again)
+            c = np.insert(c, i + 1, c_mid)
+            P = np.insert(P, i + 1, P_mid)
+            M = np.insert(M, i + 1, M_mid)
+
+        timing.count("dense_curve depths", len(c))
+        if c_start > c_end:
+            return c[::-1], P[::-1], M[::-1]
+        return c, P, M
+
+    # 𝜙Mn at given axial loads, on the IR-diagram as plotted
+    @timing.timed("capacity_at")
+    def capacity_at(self, Pu, main_dia, z, Ast, An, tol=1e-4, max_iter=50):
+        """
+        Pu : axial load(s), kN, compression positive
+        main_dia : rebar diameter, mm
+        z : distance from top edge of each rebar, cm
+        Ast, An : rebar and net concrete area, cm2
+
+        Between pure bending and zero tension c is solved for each Pu, above
+        and below them 𝜙Mn is on the straight segments to pure compression
+        (capped at 𝜙Pn_max) and to pure tension, as the plotted diagram.
+        Pu between 0 and the 𝜙Pn solved at pure bending is pure bending.
+
+        Returns 𝜙Mn (kN-m) and nuetral axis c (cm) with the shape of Pu,
+        c is nan on the straight segments, both nan outside the diagram
+        """
+        Pu = np.asarray(Pu, dtype=float)
+
+        # Control points, compression positive
+        c_pb = self.pure_bending_depth(main_dia, z, tol, max_iter)
+        𝜙Pn_pb, 𝜙Mn_pb = self.PnMn_curve(c_pb, main_dia, z)
+        𝜙Pn_pb = max(-𝜙Pn_pb, 0)
+        𝜙Pn_zt, 𝜙Mn_zt = self.PnMn_curve(self.d, main_dia, z)
+        𝜙Pn_zt = -𝜙Pn_zt
+        𝜙Pn_pc, 𝜙Pn_max = (abs(P) for P in self.pure_compression(Ast, An))
+        top = min(𝜙Pn_pc, 𝜙Pn_max)
+        𝜙Pn_pt = self.pure_tension(Ast * 1e2)
+
+        # Curved part, loads outside it are solved at its ends and replaced
+        c = bracketed_root(
+            lambda c: -self.PnMn_curve(c, main_dia, z)[0] - np.clip(Pu, 𝜙Pn_pb, 𝜙Pn_zt),
+            np.full(Pu.shape, c_pb),
+            np.full(Pu.shape, self.d),
+            tol=tol,
+            max_iter=max_iter,
+        )
+        _, 𝜙Mn = self.PnMn_curve(c, main_dia, z)
+
+        bending = (Pu >= 0) & (Pu <= 𝜙Pn_pb)
+        compression = (Pu > 𝜙Pn_zt) & (Pu <= top)
+        tension = (Pu < 0) & (Pu >= 𝜙Pn_pt)
+        outside = (Pu > top) | (Pu < 𝜙Pn_pt)
+
+        𝜙Mn = np.where(compression, 𝜙Mn_zt * (𝜙Pn_pc - Pu) / (𝜙Pn_pc - 𝜙Pn_zt), 𝜙Mn)
+        𝜙Mn = np.where(tension, 𝜙Mn_pb * (Pu - 𝜙Pn_pt) / -𝜙Pn_pt, 𝜙Mn)
+        𝜙Mn = np.where(bending, 𝜙Mn_pb, 𝜙Mn)
+        𝜙Mn = np.where(outside, np.nan, 𝜙Mn)
+        c = np.where(bending, c_pb, c)
+        c = np.where(compression | tension | outside, np.nan, c)
+
+        return 𝜙Mn, c
 
     ## Pure Compression, εc = 0
+    @timing.timed("control point: pure compression")
     def pure_compression(self, Ast, An):
         Ast = Ast * 100  # convert to mm2
         An = An * 100  # convert to mm2
@@ -167,19 +403,21 @@ class Column:
         return 𝜙Pn, 𝜙Pn_max
 
     #  Zero Tension
-    def zero_tension(self, main_dia, df):
+    @timing.timed("control point: zero tension")
+    def zero_tension(self, main_dia, rebars):
         """
         εcu = 0.003
         εs = 0
         """
         c = self.d  # cm
         a = self.β1 * c  # cm
-        𝜙Pn, 𝜙Mn, df = self.PnMn_calculation(c, a, main_dia, df, "ft0", "Ft0")
+        𝜙Pn, 𝜙Mn, _, _ = self.PnMn_calculation(c, a, main_dia, rebars)
 
         return 𝜙Pn, 𝜙Mn, c
 
     # Balance(fs = fy)
-    def balance(self, main_dia, df, rect=False):
+    @timing.timed("control point: balance")
+    def balance(self, main_dia, rebars, rect=False):
         """
         εcu = 0.003
         εs = εy
@@ -187,44 +425,59 @@ class Column:
         ey = self.fy / self.Es  # bottom rebar strain
         c = 0.003 * self.d / (0.003 + ey)
         a = self.β1 * c  # cm
-        𝜙Pn, 𝜙Mn, df = self.PnMn_calculation(c, a, main_dia, df, "fb", "Fb")
+        𝜙Pn, 𝜙Mn, _, _ = self.PnMn_calculation(c, a, main_dia, rebars)
 
         return 𝜙Pn, 𝜙Mn, c
 
+    # Nuetral axis depth of pure bending, 𝜙Pn = 0, solved once per rebar layout
+    def pure_bending_depth(self, main_dia, z, tol=1e-4, max_iter=50):
+        """
+        tol : tolerance of nuetral axis, cm
+        max_iter : iteration cap of root solver
+        """
+        z = np.asarray(z, dtype=float)
+        key = (main_dia, z.tobytes(), tol, max_iter)
+        if not hasattr(self, "_pure_bending"):
+            self._pure_bending = {}
+        if key in self._pure_bending:
+            return self._pure_bending[key]
+
+        def axial(c):
+            timing.count("pure_bending iterations")
+            return self.PnMn_curve(c, main_dia, z)[0]
+
+        # Shallow block is tension(𝜙Pn > 0), zero tension(c = d) is compression
+        c = bracketed_root(
+            axial,
+            1e-3 * self.h,
+            self.d,
+            tol=tol,
+            max_iter=max_iter,
+        )
+        if np.isnan(c):
+            raise ValueError("Pure bending: 𝜙Pn = 0 is not between c = 0 and c = d")
+        self._pure_bending[key] = float(c)
+        return float(c)
+
     # Pure Bending
-    def pure_bending(self, main_dia, df):
+    @timing.timed("control point: pure bending")
+    def pure_bending(self, main_dia, rebars, tol=1e-4, max_iter=50):
         """
         εcu = 0.003
         Pu = 0
+        tol : tolerance of nuetral axis, cm
+        max_iter : iteration cap of root solver
         """
-        # Try c
-        c = self.d2  # cm
-
-        nuetral_axis = [c]
-        axial = []
-        moment = []
-
-        while True:
-            a = self.β1 * c  # cm
-
-            temp = [0]
-            𝜙Pn, 𝜙Mn, df = self.PnMn_calculation(c, a, main_dia, df, "fm", "Fm")
-            if 𝜙Pn <= 0:
-                break
-            elif 𝜙Pn > temp[-1]:
-                c += 1  # Neutal axis < d2
-            else:
-                c -= 1  # Neutal axis > d2
-            temp.append(𝜙Pn)
-
-            nuetral_axis.append(c)
-            axial.append(𝜙Pn)
-            moment.append(𝜙Mn)
+        c = self.pure_bending_depth(main_dia, rebars["z"], tol, max_iter)
+        a = self.β1 * c  # cm
+        𝜙Pn, 𝜙Mn, fs, Fs = self.PnMn_calculation(c, a, main_dia, rebars)
 
-        display_table(df)
+        if self.verbose:
+            display_table(rebars.to_frame(fm=fs, Fm=Fs))
 
         return 𝜙Pn, 𝜙Mn, c
 
     ## Pure Tension
+    @timing.timed("control point: pure tension")
     def pure_tension(self, As):
         return -self.fy * As * 1e-3
@@ -0,0 +1,86 @@
+import numpy as np
+
+from utils import points_in_polygon
+
+
+# ----------------------------------------------------------------
+## Fiber meshes, coordinates as the rebars of each section
+# ----------------------------------------------------------------
+def polygon_fibers(outer, holes, n):
+    """
+    n x n grid over the bounding box, cells with the center inside the
+    outline and outside the holes are kept
+    Returns x, y (cm), distance from top edge z (cm) and area (cm2) of fibers
+    """
+    (x0, y0), (x1, y1) = outer.min(axis=0), outer.max(axis=0)
+    dx, dy = (x1 - x0) / n, (y1 - y0) / n
+    x, y = np.meshgrid(x0 + (np.arange(n) + 0.5) * dx, y0 + (np.arange(n) + 0.5) * dy)
+    x, y = x.ravel(), y.ravel()
+
+    inside = points_in_polygon(x, y, outer)
+    for hole in holes:
+        inside &= ~points_in_polygon(x, y, hole)
+    x, y = x[inside], y[inside]
+
+    return x, y, y1 - y, np.full(x.shape, dx * dy)
+
+
+def circle_fibers(dia, n):
+    """
+    n rings x 4n sectors over the circle, origin at the center
+    Returns x, y (cm), distance from top edge z (cm) and exact area (cm2)
+    """
+    R = dia / 2
+    r = np.linspace(0, R, n + 1)
+    t = np.linspace(0, 2 * np.pi, 4 * n + 1)
+    r0, t0 = np.meshgrid(r[:-1], t[:-1])
+    r1, t1 = np.meshgrid(r[1:], t[1:])
+
+    area = (r1**2 - r0**2) * (t1 - t0) / 2
+
+    # Centroid of each annular sector
+    half = (t1 - t0) / 2
+    rc = 2 * np.sin(half) * (r1**3 - r0**3) / (3 * half * (r1**2 - r0**2))
+    x = (rc * np.cos(t0 + half)).ravel()
+    y = (rc * np.sin(t0 + half)).ravel()
+
+    return x, y, R - y, area.ravel()
+
+
+# ----------------------------------------------------------------
+## Concrete fibers
+# ----------------------------------------------------------------
+# Hognestad parabola, compression positive, no tension
+def concrete_stress(strain, fc, ε0=0.002, εcu=0.003):
+    f = 0.85 * fc
+    r = strain / ε0
+    rising = f * (2 * r - r**2)
+    falling = f * (1 - 0.15 * (strain - ε0) / (εcu - ε0))
+    σ = np.where(strain <= ε0, rising, falling)
+    return np.where(strain > 0, σ, 0)  # MPa
+
+
+def concrete_force(z, area, c, fc, ref):
+    """
+    z : distance from top edge of each fiber, cm
+    area : area of each fiber, cm2
+    c : distance from top to nuetral axis, cm (scalar or array of depths)
+    ref : depth of the moment reference from top edge, cm
+
+    Returns Cc (kN, compression negative) and Mc (kN-m, counter clockwise)
+    with the shape of c, plus the force of each fiber, kN
+    """
+    c = np.asarray(c, dtype=float)
+    z = np.asarray(z, dtype=float)
+    area = np.asarray(area, dtype=float)
+    if z.ndim == 1:
+        z = z.reshape((-1,) + (1,) * c.ndim)
+    area = area.reshape((-1,) + (1,) * (z.ndim - 1))
+
+    # Strain 0.003 at top fiber, compression positive
+    strain = 0.003 * (c - z) / c
+    F = -concrete_stress(strain, fc) * area * 1e2 * 1e-3  # kN
+
+    Cc = F.sum(axis=0)
+    Mc = -(F * (ref - z)).sum(axis=0) * 1e-2
+    return Cc, Mc, F
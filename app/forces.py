@@ -0,0 +1,240 @@
+import numpy as np
+import pandas as pd
+
+from absl import app, flags
+from absl.flags import FLAGS
+
+import batch
+import timing
+from cache import CurveCache
+from store import ResultWriter
+from hull import hull_candidates
+from check import FacetIndex, surface_facets
+from pipeline import capacity_lookups, load_checks
+
+flags.DEFINE_string("forces", None, "column force table of frame analysis, .csv")
+flags.DEFINE_string("sections", None, "section definitions as batch.py --input")
+flags.DEFINE_string("members", None, "member, section pairs .csv, optional")
+flags.DEFINE_list(
+    "force_columns",
+    ["member", "station", "combo", "P", "M2", "M3"],
+    "headers of member, station, combo, P, M2, M3 in the force table",
+)
+flags.DEFINE_bool("compression_negative", True, "P of the table, as ETABS / SAP2000")
+flags.DEFINE_bool("flip_M3", False, "negate M3, so +Mux compresses the top edge")
+flags.DEFINE_bool("flip_M2", False, "negate M2, so +Muy compresses the right edge")
+flags.DEFINE_integer("chunksize", 1_000_000, "rows of the force table read at once")
+flags.DEFINE_bool("hull", True, "check only the demands on the convex hull of a member")
+flags.DEFINE_float(
+    "hull_margin", 0.02, "also check demands this near the hull, of size"
+)
+
+COLUMNS = ["member", "station", "combo", "P", "M2", "M3"]
+
+
+# ----------------------------------------------------------------
+## Force table, read in chunks
+# ----------------------------------------------------------------
+def read_forces(path, columns=COLUMNS, chunksize=1_000_000):
+    """
+    path : force table .csv, one row per member, station and combo
+    columns : headers of member, station, combo, P (kN), M2, M3 (kN-m)
+
+    Yields DataFrames of at most chunksize rows with the columns of COLUMNS,
+    the whole file is never in memory
+    """
+    names = dict(zip(columns, COLUMNS))
+    reader = pd.read_csv(
+        path,
+        usecols=list(columns),
+        dtype={columns[0]: str, columns[2]: str},
+        chunksize=chunksize,
+    )
+    for chunk in reader:
+        yield chunk.rename(columns=names)[COLUMNS]
+
+
+# Section id of each member, members not listed use the section of same id
+def read_members(path):
+    if path is None:
+        return {}
+    df = pd.read_csv(path, dtype=str)
+    return dict(zip(df["member"], df["section"]))
+
+
+# ----------------------------------------------------------------
+## Capacity of the sections, computed once per run
+# ----------------------------------------------------------------
+class Sections:
+    """
+    sections : rows of batch.read_sections, by their id
+    Capacity and facet index of a section are computed on first use
+    """
+
+    def __init__(self, sections, cache_dir=None):
+        self.rows = {str(row["id"]): row for row in sections}
+        self.cache = CurveCache(cache_dir, max_items=len(self.rows) or 1)
+        self.lookups = {}
+        self.indexes = {}
+
+    def __contains__(self, id):
+        return id in self.rows
+
+    def capacity(self, id):
+        row = self.rows[id]
+        return self.cache.get_or_compute(
+            batch.capacity_key(row), lambda: batch.row_capacity(row)
+        )
+
+    def demand_capacity(self, id, Pu, Mux, Muy):
+        """
+        Pu, Mux, Muy : arrays of demands, kN and kN-m, compression positive
+        Returns DC of pipeline.load_checks for each demand, as batch.py
+        """
+        shape = self.rows[id]["section"]
+        if id not in self.lookups:
+            capacity = self.capacity(id)
+            self.lookups[id] = capacity_lookups(capacity)
+            if shape != "circle":
+                surface = [capacity[f"surface_{k}"] for k in ("Pn", "Mnx", "Mny")]
+                self.indexes[id] = FacetIndex(surface_facets(*surface))
+
+        checks = load_checks(
+            shape, Pu, Mux, Muy, self.lookups[id], index=self.indexes.get(id)
+        )
+        return checks["DC"]
+
+
+# ----------------------------------------------------------------
+## Checks of a force table, envelope of each member
+# ----------------------------------------------------------------
+def check_chunk(
+    chunk,
+    sections,
+    members,
+    compression_negative=True,
+    margin=None,
+    flip=(False, False),
+):
+    """
+    chunk : DataFrame of read_forces
+    margin : None checks every row, else only the rows on or within margin
+        of the convex hull of each member's demands, see hull.hull_candidates
+    flip : negate M3, M2 of the table to the signs of the section
+
+    Returns the chunk with section, Pu, Mux, Muy and DC columns, M3 about the
+    major axis is taken as Mux and M2 as Muy. Moments keep their sign, +Mux
+    compresses the top edge and +Muy the right edge as the surface, since
+    an unsymmetric section differs both ways. DC is nan for the rows left
+    out by the hull. Rows of unknown members are dropped.
+    """
+    chunk = chunk.assign(section=chunk["member"].map(lambda m: members.get(m, m)))
+    chunk = chunk[chunk["section"].map(sections.__contains__)]
+    chunk = chunk.assign(
+        Pu=-chunk["P"] if compression_negative else chunk["P"],
+        Mux=-chunk["M3"] if flip[0] else chunk["M3"],
+        Muy=-chunk["M2"] if flip[1] else chunk["M2"],
+        DC=np.nan,
+    )
+
+    for id, rows in chunk.groupby("section", sort=False):
+        if margin is not None:
+            with timing.stage("demand hulls"):
+                rows = rows.loc[_hull_rows(rows, margin)]
+        dc = sections.demand_capacity(
+            id, rows["Pu"].to_numpy(), rows["Mux"].to_numpy(), rows["Muy"].to_numpy()
+        )
+        chunk.loc[rows.index, "DC"] = dc
+    return chunk
+
+
+# Index of the rows on the demand hull of each member
+def _hull_rows(rows, margin):
+    index = []
+    for _, member in rows.groupby("member", sort=False):
+        points = member[["Pu", "Mux", "Muy"]].to_numpy()
+        index.append(member.index[hull_candidates(points, margin)])
+    return np.concatenate(index)
+
+
+# Row of the largest D/C of each member
+def governing(df):
+    df = df.reset_index(drop=True)
+    return df.loc[df.groupby("member")["DC"].idxmax().dropna()]
+
+
+def check_forces(
+    chunks,
+    sections,
+    members,
+    compression_negative=True,
+    margin=None,
+    flip=(False, False),
+):
+    """
+    chunks : DataFrames of read_forces
+    margin, flip : see check_chunk
+    Returns the governing row of each member and the counts of rows checked
+    and skipped, only the envelope is kept between chunks
+    """
+    envelope, checked, skipped, evaluated = None, 0, 0, 0
+    for chunk in chunks:
+        with timing.stage("check forces"):
+            result = check_chunk(
+                chunk, sections, members, compression_negative, margin, flip
+            )
+            checked += len(result)
+            skipped += len(chunk) - len(result)
+            evaluated += int(result["DC"].notna().sum())
+            best = governing(result)
+            envelope = (
+                best if envelope is None else governing(pd.concat([envelope, best]))
+            )
+        print(f"[INFO] {checked + skipped} rows read, {evaluated} D/C evaluated")
+
+    columns = ["member", "section", "DC", "combo", "station", "Pu", "Mux", "Muy"]
+    if envelope is None:
+        envelope = pd.DataFrame(columns=columns)
+    return envelope[columns].sort_values("member"), checked, skipped
+
+
+def main(argv):
+    timing.enable(FLAGS.timing or FLAGS.timing_output is not None)
+
+    sections = Sections(batch.read_sections(FLAGS.sections), FLAGS.cache_dir)
+    members = read_members(FLAGS.members)
+    chunks = read_forces(FLAGS.forces, FLAGS.force_columns, FLAGS.chunksize)
+
+    envelope, checked, skipped = check_forces(
+        chunks,
+        sections,
+        members,
+        FLAGS.compression_negative,
+        FLAGS.hull_margin if FLAGS.hull else None,
+        (FLAGS.flip_M3, FLAGS.flip_M2),
+    )
+    if FLAGS.store:
+        with ResultWriter(FLAGS.store) as store:
+            store.extend(envelope.to_dict("records"))
+    else:
+        batch.write_results(FLAGS.output, envelope.to_dict("records"))
+
+    failed = int((envelope["DC"] > 1).sum())
+    print(f"[INFO] {checked} rows checked, {skipped} of unknown members skipped")
+    print(f"[INFO] {len(envelope)} members, {failed} with D/C > 1")
+    print(f"[INFO] Results written to {FLAGS.store or FLAGS.output}")
+
+    if FLAGS.timing:
+        timing.summary()
+    if FLAGS.timing_output:
+        timing.to_json(FLAGS.timing_output)
+
+
+if __name__ == "__main__":
+    flags.mark_flags_as_required(["forces", "sections"])
+    app.run(main)
+
+"""
+python app/forces.py --forces=column_forces.csv --sections=sections.csv \
+    --members=members.csv --output=envelope.csv
+"""
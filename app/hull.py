@@ -0,0 +1,45 @@
+import numpy as np
+
+
+# Demands that can govern against a convex capacity surface
+def hull_candidates(points, margin=0.0):
+    """
+    points : (n, k) demands, e.g. (Pu, Mux, Muy) of one member
+    margin : also keep the points up to margin inside the hull, as fraction
+        of the size of the cloud, for surfaces that are not exactly convex
+
+    Returns indices of the hull vertices and of the points within margin of
+    the hull. The D/C of a demand grows convexly along any line when the
+    capacity is convex around the origin, so the largest D/C of the cloud is
+    at one of these points.
+    """
+    points = np.atleast_2d(np.asarray(points, dtype=float))
+    n = len(points)
+    if n == 0:
+        return np.arange(0)
+
+    # Cloud in a unit box, constant columns dropped (e.g. Muy = 0 is a plane)
+    lo, size = points.min(axis=0), np.ptp(points, axis=0)
+    varies = size > 0
+    scaled = (points[:, varies] - lo[varies]) / size[varies]
+    dims = scaled.shape[1]
+
+    if dims == 0:
+        return np.arange(1)  # all points are the same
+    if dims == 1:
+        x = scaled[:, 0]
+        return np.flatnonzero((x <= margin) | (x >= 1 - margin))
+    if n <= dims + 1:
+        return np.arange(n)
+
+    from scipy.spatial import ConvexHull, QhullError
+
+    try:
+        hull = ConvexHull(scaled)
+    except QhullError:
+        return np.arange(n)  # flat cloud, check every point
+
+    # Signed distance to the nearest facet plane, 0 on the hull
+    normal, offset = hull.equations[:, :-1], hull.equations[:, -1]
+    distance = (scaled @ normal.T + offset).max(axis=1)
+    return np.flatnonzero(distance >= -margin - 1e-9)
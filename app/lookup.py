@@ -0,0 +1,170 @@
+import numpy as np
+
+
+# ----------------------------------------------------------------
+## Monotone piecewise cubic interpolation (PCHIP)
+# ----------------------------------------------------------------
+def pchip_slopes(x, y):
+    """
+    Slopes at the knots by Fritsch-Carlson, so the cubic between two knots
+    never overshoots them and each monotone run of y stays monotone.
+    x must be strictly increasing.
+    """
+    h = np.diff(x)
+    δ = np.diff(y) / h
+    if len(x) == 2:
+        return np.full(2, δ[0])
+
+    # Weighted harmonic mean inside, zero at local extremes
+    w1, w2 = 2 * h[1:] + h[:-1], h[1:] + 2 * h[:-1]
+    same = δ[:-1] * δ[1:] > 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        inner = (w1 + w2) / (w1 / δ[:-1] + w2 / δ[1:])
+    d = np.r_[0.0, np.where(same, inner, 0.0), 0.0]
+
+    # One sided three point ends, limited to keep the shape
+    for end, (h0, h1, δ0, δ1) in (
+        (0, (h[0], h[1], δ[0], δ[1])),
+        (-1, (h[-1], h[-2], δ[-1], δ[-2])),
+    ):
+        s = ((2 * h0 + h1) * δ0 - h0 * δ1) / (h0 + h1)
+        if np.sign(s) != np.sign(δ0):
+            s = 0.0
+        elif np.sign(δ0) != np.sign(δ1) and abs(s) > 3 * abs(δ0):
+            s = 3 * δ0
+        d[end] = s
+    return d
+
+
+class Interpolator:
+    """
+    x, y : knots, x strictly increasing
+    d : slopes at the knots, from pchip_slopes if None
+
+    Called with an array of queries, each found by binary search in
+    O(log n). Queries outside [x[0], x[-1]] give nan.
+    """
+
+    def __init__(self, x, y, d=None):
+        self.x = np.asarray(x, dtype=float)
+        self.y = np.asarray(y, dtype=float)
+        self.d = pchip_slopes(self.x, self.y) if d is None else np.asarray(d, float)
+
+    def __call__(self, q):
+        q = np.asarray(q, dtype=float)
+        x, y, d = self.x, self.y, self.d
+
+        i = np.clip(np.searchsorted(x, q, side="right") - 1, 0, len(x) - 2)
+        h = x[i + 1] - x[i]
+        t = (q - x[i]) / h
+
+        # Cubic Hermite basis
+        value = (
+            y[i] * (1 + 2 * t) * (1 - t) ** 2
+            + d[i] * h * t * (1 - t) ** 2
+            + y[i + 1] * t**2 * (3 - 2 * t)
+            - d[i + 1] * h * t**2 * (1 - t)
+        )
+        return np.where((q >= x[0]) & (q <= x[-1]), value, np.nan)
+
+    # Knots and slopes as one (3, n) array, see from_array
+    def to_array(self):
+        return np.stack([self.x, self.y, self.d])
+
+    @classmethod
+    def from_array(cls, array):
+        x, y, d = array
+        return cls(x, y, d)
+
+
+# Indices where x keeps moving one way, drops points that step back
+def _monotone(x, increasing=True):
+    x = np.asarray(x, dtype=float)
+    if not increasing:
+        return _monotone(-x)
+    best = np.maximum.accumulate(x)
+    return np.flatnonzero(np.r_[True, x[1:] > best[:-1]])
+
+
+# Straight segments of a polyline split to the median segment length, so a
+# cubic through the points follows them instead of bulging
+def _densify(x, y):
+    scale = [np.ptp(x) or 1, np.ptp(y) or 1]
+    length = np.hypot(np.diff(x) / scale[0], np.diff(y) / scale[1])
+    step = np.median(length[length > 0])
+    n = np.maximum(np.ceil(length / step).astype(int), 1)
+
+    # Parameter of every new point, segment index plus fraction
+    start = np.repeat(np.arange(len(n)), n)
+    t = start + (np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)) / n[start]
+    t = np.r_[t, len(n)]
+    index = np.arange(len(x))
+    return np.interp(t, index, x), np.interp(t, index, y)
+
+
+# ----------------------------------------------------------------
+## Capacity lookups of an IR-curve
+# ----------------------------------------------------------------
+class CapacityLookup:
+    """
+    𝜙Mn(Pu) and 𝜙Pn(Mu) of an IR-curve by monotone interpolation, built
+    once from a computed curve, e.g. IRCurve.Pn, IRCurve.Mn
+
+        lookup = CapacityLookup.from_curve(curve.Pn, curve.Mn)
+        lookup.Mn_at([800, 1200])  # kN-m
+        lookup.Pn_at(150)  # (compression, tension) branches, kN
+
+    Saved with to_arrays() next to the curve and loaded with from_arrays().
+    """
+
+    def __init__(self, Mn, Pn_compression, Pn_tension):
+        self.Mn = Mn  # Interpolator of 𝜙Mn over 𝜙Pn
+        self.Pn_compression = Pn_compression  # 𝜙Pn over 𝜙Mn, above balance
+        self.Pn_tension = Pn_tension  # 𝜙Pn over 𝜙Mn, below balance
+
+    @classmethod
+    def from_curve(cls, Pn, Mn):
+        """
+        Pn, Mn : 𝜙Pn (kN, compression positive) and 𝜙Mn (kN-m) from pure
+            compression to pure tension
+        """
+        Pn, Mn = np.asarray(Pn, dtype=float), np.abs(np.asarray(Mn, dtype=float))
+        Pn, Mn = _densify(Pn, Mn)  # e.g. pure compression to zero tension
+
+        # 𝜙Pn falls along the curve, ascending for the interpolation
+        i = _monotone(Pn, increasing=False)[::-1]
+        by_Pn = Interpolator(Pn[i], Mn[i])
+
+        # 𝜙Mn rises up to balance then falls, one branch each side
+        k = int(np.argmax(Mn))
+        i = _monotone(Mn[: k + 1])
+        compression = Interpolator(Mn[i], Pn[i])
+        i = k + _monotone(Mn[k:], increasing=False)[::-1]
+        tension = Interpolator(Mn[i], Pn[i])
+
+        return cls(by_Pn, compression, tension)
+
+    # 𝜙Mn (kN-m) at axial loads Pu (kN, compression positive), nan outside
+    def Mn_at(self, Pu):
+        return self.Mn(Pu)
+
+    # 𝜙Pn (kN) on the compression and tension branches at moments Mu (kN-m)
+    def Pn_at(self, Mu):
+        Mu = np.abs(np.asarray(Mu, dtype=float))
+        return self.Pn_compression(Mu), self.Pn_tension(Mu)
+
+    def to_arrays(self, prefix="lookup_"):
+        return {
+            f"{prefix}Mn": self.Mn.to_array(),
+            f"{prefix}Pn_compression": self.Pn_compression.to_array(),
+            f"{prefix}Pn_tension": self.Pn_tension.to_array(),
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays, prefix="lookup_"):
+        return cls(
+            *(
+                Interpolator.from_array(arrays[f"{prefix}{name}"])
+                for name in ("Mn", "Pn_compression", "Pn_tension")
+            )
+        )
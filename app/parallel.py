@@ -0,0 +1,109 @@
+import contextlib
+import io
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from absl.flags import FLAGS
+
+import timing
+
+BACKENDS = ["process", "thread"]
+
+
+def executor(backend="process", workers=0, initializer=None, initargs=()):
+    """
+    backend : "process" for CPU bound work, "thread" for the GIL free numpy
+        parts and no start-up or pickling cost
+    workers : 0 = all cores
+    """
+    workers = workers or os.cpu_count()
+    if backend == "thread":
+        return ThreadPoolExecutor(workers, initializer=initializer, initargs=initargs)
+    return ProcessPoolExecutor(workers, initializer=initializer, initargs=initargs)
+
+
+# ----------------------------------------------------------------
+## Console output of each task, printed in task order
+# ----------------------------------------------------------------
+class _ThreadStdout:
+    """sys.stdout that sends each thread's output to its own buffer, if set"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+    def write(self, text):
+        return (getattr(self.local, "buffer", None) or self.stream).write(text)
+
+    def flush(self):
+        (getattr(self.local, "buffer", None) or self.stream).flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+def _captured(fn, args):
+    buffer = io.StringIO()
+    if isinstance(sys.stdout, _ThreadStdout):
+        sys.stdout.local.buffer = buffer
+        try:
+            result = fn(*args)
+        finally:
+            sys.stdout.local.buffer = None
+    else:
+        with contextlib.redirect_stdout(buffer):
+            result = fn(*args)
+
+    # Timers of a worker process are sent back with the result
+    snapshot = None
+    if timing.ENABLED and os.getpid() != _parent:
+        snapshot = timing.snapshot(reset_after=True)
+    return result, buffer.getvalue(), snapshot
+
+
+_parent = os.getpid()
+
+
+def _init_worker(argv, timing_enabled):
+    if not FLAGS.is_parsed():
+        FLAGS(argv)
+    timing.enable(timing_enabled)
+
+
+def run_ordered(tasks, backend="process", workers=1):
+    """
+    tasks : list of (function, args)
+
+    Returns the results in the order of tasks. Each task's console output
+    is printed as one block, also in the order of tasks, so a run prints
+    the same whatever the backend. workers = 1 runs the tasks one by one
+    in this process.
+    """
+    if workers == 1 or len(tasks) <= 1:
+        return [fn(*args) for fn, args in tasks]
+
+    stdout = sys.stdout
+    if backend == "thread":
+        sys.stdout = _ThreadStdout(stdout)
+
+    results = []
+    try:
+        with executor(
+            backend,
+            min(workers or os.cpu_count(), len(tasks)),
+            initializer=_init_worker,
+            initargs=(sys.argv, timing.ENABLED),
+        ) as pool:
+            futures = [pool.submit(_captured, fn, args) for fn, args in tasks]
+            for future in futures:
+                result, text, snapshot = future.result()
+                stdout.write(text)
+                if snapshot is not None:
+                    timing.merge(snapshot)
+                results.append(result)
+    finally:
+        sys.stdout = stdout
+
+    return results
@@ -0,0 +1,326 @@
+import json
+
+import numpy as np
+
+import analysis
+import timing
+from analysis import Material, Section
+from check import FacetIndex, surface_facets, demand_capacity
+from lookup import CapacityLookup
+from rebars import RebarLayout
+from utils import (
+    convert_input_to_list,
+    get_rebar_coordinates,
+    information,
+    polygon_section,
+)
+
+
+# ----------------------------------------------------------------
+## Cached stages with dependency tracking
+# ----------------------------------------------------------------
+def _same(a, b):
+    try:
+        return bool(np.array_equal(a, b)) if isinstance(a, np.ndarray) else a == b
+    except (TypeError, ValueError):
+        return False
+
+
+class Pipeline:
+    """
+    stages : {name: (function, inputs)}, inputs are parameter or stage names
+        and the function is called with their values as keyword arguments,
+        stage names must differ from the parameter names
+
+    A stage is computed when first read and kept until one of its inputs,
+    or a stage it reads, changes. set() only drops the stages downstream
+    of the parameters that really changed.
+    """
+
+    def __init__(self, stages, **params):
+        self.stages = stages
+        self.params = {}
+        self.values = {}
+
+        # Stages reading each parameter or stage
+        self.dependents = {}
+        for name, (_, inputs) in stages.items():
+            for i in inputs:
+                self.dependents.setdefault(i, set()).add(name)
+
+        self.set(**params)
+
+    def set(self, **params):
+        """Returns the names of the stages the change invalidated"""
+        changed = [
+            k
+            for k, v in params.items()
+            if k not in self.params or not _same(self.params[k], v)
+        ]
+        self.params.update(params)
+
+        stale, todo = set(), changed
+        while todo:
+            for stage in self.dependents.get(todo.pop(), ()):
+                if stage not in stale:
+                    stale.add(stage)
+                    todo.append(stage)
+
+        for stage in stale:
+            self.values.pop(stage, None)
+        return stale
+
+    def __getitem__(self, name):
+        if name in self.values:
+            return self.values[name]
+
+        function, inputs = self.stages[name]
+        kwargs = {
+            i: self[i] if i in self.stages else self.params.get(i) for i in inputs
+        }
+        timing.count(f"stage {name}")
+        with timing.stage(f"stage {name}"):
+            value = function(**kwargs)
+
+        self.values[name] = value
+        return value
+
+
+# ----------------------------------------------------------------
+## Section stages, parameters as the rows of batch.py
+# ----------------------------------------------------------------
+# Fields a row may leave out, same defaults as rect.py / circular.py flags
+DEFAULTS = {
+    "fc": 23.5,
+    "fy": 395,
+    "fv": 235,
+    "Es": 200000,
+    "c": 4,
+    "stirrup": "tie",
+    "concrete": "whitney",
+    "mesh": 20,
+    "middle_rebars": 0,
+    "top_layers": "",
+    "Pu": 0,
+    "Mux": 0,
+    "Muy": 0,
+}
+
+# Row fields of the outline and the rebar layout
+GEOMETRY = [
+    "section",
+    "b",
+    "h",
+    "dia",
+    "N",
+    "c",
+    "main_dia",
+    "traverse_dia",
+    "bottom_layers",
+    "top_layers",
+    "middle_rebars",
+    "outline",
+    "holes",
+    "bars",
+]
+
+
+# Vertices in JSON rows are lists, in CSV rows JSON text
+def as_list(value):
+    return json.loads(value) if isinstance(value, str) else value
+
+
+# Outline and rebars, independent of the materials
+def layout(section, c, main_dia, traverse_dia, **row):
+    """
+    Returns shape, b, h (cm), RebarLayout, polygon and N counted in Ast
+    """
+    main_dia, traverse_dia, covering = float(main_dia), float(traverse_dia), float(c)
+
+    if section == "rect":
+        b, h = float(row["b"]), float(row["h"])
+        bottom_layers = convert_input_to_list(str(row["bottom_layers"]))
+        top_layers = convert_input_to_list(str(row["top_layers"] or ""))
+        rebars = get_rebar_coordinates(
+            b,
+            h,
+            covering,
+            main_dia / 10,
+            traverse_dia / 10,
+            bottom_layers,
+            top_layers,
+            int(row["middle_rebars"] or 0),
+        )
+        N = sum(bottom_layers + top_layers)  # Ast as rect.py
+        return dict(shape=section, b=b, h=h, rebars=rebars, polygon=None, N=N)
+
+    if section == "polygon":
+        outer, holes = polygon_section(
+            as_list(row["outline"]), as_list(row.get("holes") or [])
+        )
+        bars = np.asarray(as_list(row["bars"]), dtype=float)
+        (x0, y0), (x1, y1) = outer.min(axis=0), outer.max(axis=0)
+        rebars = RebarLayout.from_points(bars[:, 0], bars[:, 1], y1, main_dia / 10)
+        return dict(
+            shape=section,
+            b=x1 - x0,
+            h=y1 - y0,
+            rebars=rebars,
+            polygon=(outer, holes),
+            N=None,
+        )
+
+    dia, N = float(row["dia"]), int(row["N"])
+    data = information(dia, covering, main_dia / 10, traverse_dia / 10, N)
+    return dict(shape="circle", b=dia, h=dia, rebars=data["rebars"], polygon=None, N=N)
+
+
+def section_of(layout, main_dia, traverse_dia, stirrup, concrete, mesh):
+    return Section(
+        main_dia=float(main_dia),
+        traverse_dia=float(traverse_dia),
+        stirrup=stirrup,
+        concrete=concrete,
+        mesh=int(mesh),
+        **layout,
+    )
+
+
+def material_of(fc, fy, fv, Es):
+    return Material(fc=fc, fy=fy, fv=fv, Es=Es)
+
+
+# Section and Material of one batch row, without a pipeline
+def row_section(row):
+    row_layout = layout(**{k: row.get(k) for k in GEOMETRY})
+    return section_of(
+        row_layout,
+        row["main_dia"],
+        row["traverse_dia"],
+        row["stirrup"],
+        row["concrete"],
+        row["mesh"],
+    )
+
+
+def row_material(row):
+    return material_of(row["fc"], row["fy"], row["fv"], row["Es"])
+
+
+def curve_x(cross_section, material, n_points, curve_tol):
+    return analysis.ir_curve(cross_section, material, n_points, curve_tol)
+
+
+# Y-Y Axis of rect section, swap b, h as rect.y_axis
+def curve_y(cross_section, material, n_points, curve_tol):
+    if cross_section.shape != "rect":
+        return None
+    return analysis.ir_curve(cross_section.swapped(), material, n_points, curve_tol)
+
+
+def surface(cross_section, material):
+    if cross_section.shape == "circle":
+        return None
+    return analysis.surface(cross_section, material)
+
+
+def facet_index(surface):
+    return None if surface is None else FacetIndex(surface_facets(*surface))
+
+
+# CapacityLookup of each IR-curve in the arrays of batch.row_capacity, by label
+def capacity_lookups(capacity):
+    labels = [label for label in ("", "_x", "_y") if f"lookup{label}_Mn" in capacity]
+    return {
+        label: CapacityLookup.from_arrays(capacity, f"lookup{label}_")
+        for label in labels
+    }
+
+
+def load_checks(shape, Pu, Mux, Muy, lookups, surface=None, index=None):
+    """
+    Pu, Mux, Muy : loads (kN, kN-m), scalars or arrays of the same shape
+    lookups : {label: CapacityLookup} of the IR-curves, "" for circle and
+        "_x", "_y" for the axes, see capacity_lookups
+
+    D/C of the loads against the plotted IR-curves, Mu / 𝜙Mn at Pu: DC_x and
+    DC_y for rect, DC of the resultant moment for circle. DC of rect and
+    polygon is biaxial against the surface, so is DC_y of polygon, which has
+    no Y-Y curve. DC of a load outside the diagram is inf, as a ray missing
+    the surface. Returns arrays with the shape of Pu.
+    """
+    Pu, Mux, Muy = np.broadcast_arrays(
+        *(np.asarray(v, dtype=float) for v in (Pu, Mux, Muy))
+    )
+    if shape == "circle":
+        𝜙Mn = lookups[""].Mn_at(Pu)
+        dc = np.where(np.isnan(𝜙Mn), np.inf, np.hypot(Mux, Muy) / 𝜙Mn)
+        return {"𝜙Mn_at_Pu": 𝜙Mn, "DC": dc}
+
+    checks, ratios = {}, {}
+    for label, Mu in (("_x", Mux), ("_y", Muy)):
+        if label in lookups:
+            checks[f"𝜙Mn_at_Pu{label}"] = lookups[label].Mn_at(Pu)
+            ratios[f"DC{label}"] = np.abs(Mu) / checks[f"𝜙Mn_at_Pu{label}"]
+
+    # One ray cast for all loads, and for DC_y of polygon
+    biaxial = [np.stack([Pu, Mux, Muy], axis=-1).reshape(-1, 3)]
+    if "DC_y" not in ratios:
+        biaxial.append(np.stack([Pu, 0 * Muy, Muy], axis=-1).reshape(-1, 3))
+    dc = demand_capacity(np.concatenate(biaxial), surface, index)
+    dc = dc.reshape(len(biaxial), *Pu.shape)
+    if "DC_y" not in ratios:
+        ratios["DC_y"] = dc[1]
+
+    return checks | ratios | {"DC": dc[0]}
+
+
+def lookups(curve_x, curve_y):
+    curves = {"_x": curve_x, "_y": curve_y}
+    return {
+        label: CapacityLookup.from_curve(curve.Pn, curve.Mn)
+        for label, curve in curves.items()
+        if curve is not None
+    }
+
+
+def checks(cross_section, lookups, facet_index, Pu, Mux, Muy):
+    if cross_section.shape == "circle":
+        lookups = {"": lookups["_x"]}
+    checks = load_checks(
+        cross_section.shape,
+        Pu or 0,
+        Mux or 0,
+        Muy or 0,
+        lookups,
+        index=facet_index,
+    )
+    return {k: float(v) for k, v in checks.items()}
+
+
+STAGES = {
+    "layout": (layout, GEOMETRY),
+    "cross_section": (
+        section_of,
+        ["layout", "main_dia", "traverse_dia", "stirrup", "concrete", "mesh"],
+    ),
+    "material": (material_of, ["fc", "fy", "fv", "Es"]),
+    "curve_x": (curve_x, ["cross_section", "material", "n_points", "curve_tol"]),
+    "curve_y": (curve_y, ["cross_section", "material", "n_points", "curve_tol"]),
+    "surface": (surface, ["cross_section", "material"]),
+    "facet_index": (facet_index, ["surface"]),
+    "lookups": (lookups, ["curve_x", "curve_y"]),
+    "checks": (checks, ["cross_section", "lookups", "facet_index", "Pu", "Mux", "Muy"]),
+}
+
+
+def section_pipeline(**row):
+    """
+    Pipeline of one section from the fields of a batch row, fields left out
+    take DEFAULTS as batch.read_sections, e.g.
+        p = section_pipeline(**row)
+        p["checks"]
+        p.set(Pu=800)  # only "checks" is recomputed on the next read
+        p.set(fc=28)  # the rebar layout is kept
+    """
+    return Pipeline(STAGES, **(DEFAULTS | {"n_points": 200} | row))
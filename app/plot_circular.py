@@ -1,6 +1,9 @@
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 
+import timing
+from report import HTMLReport
+
 
 # Plot 1 circular section
 def circular_section(
@@ -111,7 +114,7 @@ def IR_diagram_plot(x_ir, y_ir, Pu, Mu):
             y=y_ir,
             mode="markers+lines",
             name="[𝜙Mn, 𝜙Pn]",
-            marker=dict(size=12),
+            marker=dict(size=4),
         ),
     )
 
@@ -141,6 +144,7 @@ def IR_diagram_plot(x_ir, y_ir, Pu, Mu):
     return fig
 
 
+@timing.timed("figure construction")
 def create_plot(c, dia, main_dia, N, data, x_ir, y_ir, Pu, Mu):
 
     section_fig = circular_section(
@@ -163,48 +167,23 @@ def create_plot(c, dia, main_dia, N, data, x_ir, y_ir, Pu, Mu):
     return section_fig, ir_fig
 
 
+# Streaming report, see report.HTMLReport
+def create_report(path="circular_plot.html", max_bytes=None, max_sections=None):
+    return HTMLReport(
+        path,
+        "Rectangle Plot",
+        widths=("48%", "48%"),
+        max_bytes=max_bytes,
+        max_sections=max_sections,
+    )
+
+
 def create_html(section_fig, ir_fig):
-    # Start building the HTML content
-    html_content = """
-    <html>
-        <head>
-            <title>Rectangle Plot</title>
-            <script src="https://cdn.plot.ly/plotly-latest.min.js"></script>
-        </head>
-        <body>
-    """
-
-    # Loop through the list of figures
-    for i in range(len(section_fig)):
-        # Convert each figure to HTML
-        section_html = section_fig[i].to_html(full_html=False, include_plotlyjs=False)
-        ir_html = ir_fig[i].to_html(full_html=False, include_plotlyjs=False)
-
-        # Add the row for this pair of figures
-        html_content += f"""
-        <div style="display: flex; justify-content: space-around; margin-bottom: 30px;">
-            <div style="width: 48%;">
-                <h1>Section Plot {i + 1}</h1>
-                {section_html}
-            </div>
-            <div style="width: 48%;">
-                <h1>IR Diagram {i + 1}</h1>
-                {ir_html}
-            </div>
-        </div>
-        """
-
-    # End the HTML content
-    html_content += """
-        </body>
-    </html>
-    """
-
-    # Write the HTML content to a file
-    with open("circular_plot.html", "w") as f:
-        f.write(html_content)
-
-    print("Please open circular_plot.html in your project folder")
+    with create_report() as report:
+        for section, ir in zip(section_fig, ir_fig):
+            report.add(section, ir)
+
+    print(f"Please open {report.pages[0]} in your project folder")
 
 
 # Displat section in each state
@@ -1,67 +1,9 @@
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 
-import pandas as pd
-
-
-def calculate_rebar_positions(c, b, N, main_dia, travesre_dia):
-    if N == 1:
-        return [c + (b - 2 * c) / 2]
-    elif N == 2:
-        return [c + travesre_dia + main_dia / 2, b - c - travesre_dia - main_dia / 2]
-    else:
-        positions = [
-            c
-            + main_dia / 2
-            + travesre_dia
-            + i * (b - 2 * c - main_dia - 2 * travesre_dia) / (N - 1)
-            for i in range(N)
-        ]
-        return positions
-
-
-def get_rebar_coordinates(
-    b, d, c, main_dia, travesre_dia, bottom_layers, top_layers, middle_rebars
-):
-    rebar_data = []
-
-    # Calculate positions of top reinforcement layers
-    layer_spacing = 2 * main_dia
-    y_top_layers = [d - c - (i + 0.5) * layer_spacing for i in range(len(top_layers))]
-
-    for y, num_bars in zip(y_top_layers, top_layers):
-        x_positions = calculate_rebar_positions(c, b, num_bars, main_dia, travesre_dia)
-        for x in x_positions:
-            z = d - y
-            rebar_data.append({"x": x, "y": y, "z": z})
-
-    # Calculate positions of bottom reinforcement layers
-
-    y_bottom_layers = [c + (i + 0.5) * layer_spacing for i in range(len(bottom_layers))]
-
-    for y, num_bars in zip(y_bottom_layers, bottom_layers):
-        x_positions = calculate_rebar_positions(c, b, num_bars, main_dia, travesre_dia)
-        for x in x_positions:
-            z = d - y
-            rebar_data.append({"x": x, "y": y, "z": z})
-
-    # Calculate positions of middle reinforcement layers
-    if middle_rebars > 0:
-        n = middle_rebars // 2
-        d_middle = min(y_top_layers) - max(y_bottom_layers)
-        s = d_middle / (n + 1)
-
-        for i in range(1, n + 1):
-            y_position = max(y_bottom_layers) + s * i
-            z = d - y_position
-            rebar_data.append(
-                {"x": c + travesre_dia + main_dia / 2, "y": y_position, "z": z}
-            )
-            rebar_data.append(
-                {"x": b - c - travesre_dia - main_dia / 2, "y": y_position, "z": z}
-            )
-
-    return pd.DataFrame(rebar_data)
+import timing
+from report import HTMLReport
+from utils import calculate_rebar_positions, get_rebar_coordinates
 
 
 def plot_rc_section(
@@ -181,7 +123,7 @@ def IR_diagram(fig, row, col, x, y, Pu, Mu, title):
     # Add the scatter plot
     fig.add_trace(
         go.Scatter(
-            x=x, y=y, mode="markers+lines", name="[𝜙Mn, 𝜙Pn]", marker=dict(size=12)
+            x=x, y=y, mode="markers+lines", name="[𝜙Mn, 𝜙Pn]", marker=dict(size=4)
         ),
         row=row,
         col=col,
@@ -250,6 +192,7 @@ def plot_IR_diagram(x_ir_mux, y_ir_mux, x_ir_muy, y_ir_muy, Pu, Mux, Muy):
     return fig
 
 
+@timing.timed("figure construction")
 def create_plot(
     b,
     h,
@@ -285,45 +228,20 @@ def create_plot(
     return section_fig, ir_fig
 
 
+# Streaming report, see report.HTMLReport
+def create_report(path="rectangle_plot.html", max_bytes=None, max_sections=None):
+    return HTMLReport(
+        path,
+        "Rectangle Plot",
+        widths=("25%", "60%"),
+        max_bytes=max_bytes,
+        max_sections=max_sections,
+    )
+
+
 def create_html(section_fig, ir_fig):
-    # Start building the HTML content
-    html_content = """
-    <html>
-        <head>
-            <title>Rectangle Plot</title>
-            <script src="https://cdn.plot.ly/plotly-latest.min.js"></script>
-        </head>
-        <body>
-    """
-
-    # Loop through the list of figures
-    for i in range(len(section_fig)):
-        # Convert each figure to HTML
-        section_html = section_fig[i].to_html(full_html=False, include_plotlyjs=False)
-        ir_html = ir_fig[i].to_html(full_html=False, include_plotlyjs=False)
-
-        # Add the row for this pair of figures
-        html_content += f"""
-        <div style="display: flex; justify-content: space-around; margin-bottom: 30px;">
-            <div style="width: 25%;">
-                <h1>Section Plot {i + 1}</h1>
-                {section_html}
-            </div>
-            <div style="width: 60%;">
-                <h1>IR Diagram {i + 1}</h1>
-                {ir_html}
-            </div>
-        </div>
-        """
-
-    # End the HTML content
-    html_content += """
-        </body>
-    </html>
-    """
-
-    # Write the HTML content to a file
-    with open("rectangle_plot.html", "w") as f:
-        f.write(html_content)
-
-    print("Congrate! Please open rectangle_plot.html in your project folder")
+    with create_report() as report:
+        for section, ir in zip(section_fig, ir_fig):
+            report.add(section, ir)
+
+    print(f"Congrate! Please open {report.pages[0]} in your project folder")
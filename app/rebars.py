@@ -0,0 +1,63 @@
+import numpy as np
+
+
+class RebarLayout:
+    """
+    Rebars of a section as contiguous, read-only float arrays
+    x, y : coordinates, cm
+    z : distance from top edge, cm
+    area : area of each rebar, cm2
+
+    Columns can be read as layout["z"], like the DataFrame it replaces.
+    Results of an analysis are returned as separate arrays, never stored here.
+    """
+
+    __slots__ = ("x", "y", "z", "area")
+
+    def __init__(self, x, y, z, area):
+        shape = np.shape(x)
+        for name, value in zip(self.__slots__, (x, y, z, area)):
+            # Own copy, so no caller can change the layout through a view
+            value = np.array(np.broadcast_to(value, shape), dtype=float).ravel()
+            value.setflags(write=False)
+            object.__setattr__(self, name, value)
+
+    # Rebars of one diameter, z measured down from top
+    @classmethod
+    def from_points(cls, x, y, top, dia):
+        """
+        x, y : coordinates, cm
+        top : y of the top edge, cm
+        dia : rebar diameter, cm
+        """
+        y = np.asarray(y, dtype=float)
+        return cls(x, y, top - y, np.pi * (dia / 2) ** 2)
+
+    def __len__(self):
+        return len(self.x)
+
+    def __getitem__(self, name):
+        if name not in self.__slots__:
+            raise KeyError(name)
+        return getattr(self, name)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("RebarLayout is read-only")
+
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    # Y-Y axis: swap x, y and measure z from the right edge at x = b
+    def swapped(self, b):
+        return RebarLayout(self.y, self.x, b - self.x, self.area)
+
+    # Table of the layout with result arrays as extra columns, for display only
+    def to_frame(self, **results):
+        import pandas as pd
+
+        return pd.DataFrame(
+            {"x": self.x, "y": self.y, "z": self.z, **results}, copy=False
+        )
@@ -3,18 +3,19 @@ import pandas as pd
 from absl import app, flags
 from absl.flags import FLAGS
 
-from plot_rect import (
-    get_rebar_coordinates,
-    create_plot,
-    create_html,
-)
 from utils import (
+    get_rebar_coordinates,
     get_valid_integer,
     convert_input_to_list,
     display_table,
     calculate_areas_in_rect,
 )
 from column import Column
+import timing
+from biaxial import interaction_surface
+from check import demand_capacity
+from parallel import BACKENDS, run_ordered
+from report import section_block
 
 ## FLAGS definition
 # https://stackoverflow.com/questions/69471891/clarification-regarding-abseil-library-flags
@@ -30,12 +31,24 @@ flags.DEFINE_float("h", 0, "depth, cm")
 flags.DEFINE_float("Pu", 0, "Axial force, kN")
 flags.DEFINE_float("Mux", 0, "Mux, kN-m")
 flags.DEFINE_float("Muy", 0, "Mux, kN-m")
+flags.DEFINE_integer("n_points", 200, "points on IR-diagram curve")
+flags.DEFINE_float(
+    "curve_tol", None, "adaptive IR-diagram curve, e.g. 1e-3 of its size"
+)
+flags.DEFINE_enum("concrete", "whitney", ["whitney", "fiber"], "concrete model")
+flags.DEFINE_integer("mesh", 20, "fiber mesh, n x n rect, n rings x 4n sectors circle")
+flags.DEFINE_bool("timing", False, "print per-stage timing summary")
+flags.DEFINE_string("timing_output", None, "write per-stage timing as .json")
+flags.DEFINE_float("report_max_mb", 50, "start a new report page past this size, MB")
+flags.DEFINE_integer("report_max_sections", None, "sections per report page")
+flags.DEFINE_integer("workers", 1, "axes and sections run concurrently, 0 = all cores")
+flags.DEFINE_enum("backend", "process", BACKENDS, "executor of workers")
 
 
 # ----------------------------------------------------------------
 ## X-X Axis
 # ----------------------------------------------------------------
-def x_axis(main_dia, N, df_rebars, column):
+def x_axis(main_dia, N, rebars, column):
     nuetral_axis = []
     x_ir_mux = []  # 𝜙Mn
     y_ir_mux = []  # 𝜙Pn
@@ -43,7 +56,7 @@ def x_axis(main_dia, N, df_rebars, column):
     Ag, Ast, An = calculate_areas_in_rect(FLAGS.b, FLAGS.h, main_dia / 10, N)  # cm2
 
     print(f"\n[INFO] Rebars coodinates(x, y) and distance from top edge(z), cm ")
-    # display_table(df_rebars)
+    # display_table(rebars)
 
     ## 1-Pure Compression
     𝜙Pn, 𝜙Pn_max = column.pure_compression(Ast, An)
@@ -51,21 +64,21 @@ def x_axis(main_dia, N, df_rebars, column):
     x_ir_mux.append(0)
 
     ## 2-Zero Tension
-    𝜙Pn, 𝜙Mn, c = column.zero_tension(main_dia, df_rebars)
+    𝜙Pn, 𝜙Mn, c = column.zero_tension(main_dia, rebars)
 
     y_ir_mux.append(abs(𝜙Pn))
     x_ir_mux.append(𝜙Mn)
     nuetral_axis.append(c)
 
     ## 3-Balance
-    𝜙Pn, 𝜙Mn, c = column.balance(main_dia, df_rebars)
+    𝜙Pn, 𝜙Mn, c = column.balance(main_dia, rebars)
 
     y_ir_mux.append(abs(𝜙Pn))
     x_ir_mux.append(𝜙Mn)
     nuetral_axis.append(c)
 
     ## 4-Pure Bending
-    𝜙Pn, 𝜙Mn, c = column.pure_bending(main_dia, df_rebars)
+    𝜙Pn, 𝜙Mn, c = column.pure_bending(main_dia, rebars)
 
     y_ir_mux.append(0)
     x_ir_mux.append(𝜙Mn)
@@ -94,13 +107,30 @@ def x_axis(main_dia, N, df_rebars, column):
     print(f"𝜙Pn_max = {abs(𝜙Pn_max):.2f} kN")
     display_table(df)
 
+    𝜙Mn, c = column.capacity_at(FLAGS.Pu, main_dia, rebars["z"], Ast, An)
+    print(f"𝜙Mn at Pu = {FLAGS.Pu:.2f} kN : {𝜙Mn:.2f} kN-m, Mux = {FLAGS.Mux:.2f} kN-m")
+
+    ## Dense curve between zero tension and pure bending
+    _, 𝜙Pn, 𝜙Mn = column.dense_curve(
+        nuetral_axis[0],
+        nuetral_axis[-1],
+        main_dia,
+        rebars["z"],
+        FLAGS.n_points,
+        FLAGS.curve_tol,
+        nuetral_axis,
+    )
+
+    x_ir_mux = [x_ir_mux[0], *𝜙Mn, x_ir_mux[-1]]
+    y_ir_mux = [y_ir_mux[0], *-𝜙Pn, y_ir_mux[-1]]
+
     return x_ir_mux, y_ir_mux
 
 
 # ----------------------------------------------------------------
 ## Y-Y Axis
 # ----------------------------------------------------------------
-def y_axis(main_dia, N, df_rebars, column):
+def y_axis(main_dia, N, rebars, column):
     """
     With Y-Y axis
     we swapp b, h and calculate distance from top of rebar (z)
@@ -112,17 +142,11 @@ def y_axis(main_dia, N, df_rebars, column):
     Ag, Ast, An = calculate_areas_in_rect(FLAGS.b, FLAGS.h, main_dia / 10, N)  # cm2
 
     # Get the rebar coordinates
-    # Create a new DataFrame with swapped 'x' and 'y' columns
-    df_swapped = df_rebars.copy()[["x", "y"]].rename(columns={"x": "y", "y": "x"})
-
-    # Rearrange the columns to [x, y]
-    df_swapped = df_swapped[["x", "y"]]
-
-    # Calculate distance from top
-    df_swapped["z"] = FLAGS.h - df_swapped["y"]
+    # Swap 'x' and 'y', then calculate distance from top
+    rebars_swapped = rebars.swapped(FLAGS.b)
 
     print(f"\n[INFO] Rebars coodinates(x, y) and distance from top edge(z), cm ")
-    # display_table(df_swapped)
+    # display_table(rebars_swapped)
 
     ## 1-Pure Compression
     𝜙Pn, 𝜙Pn_max = column.pure_compression(Ast, An)
@@ -130,21 +154,21 @@ def y_axis(main_dia, N, df_rebars, column):
     x_ir_muy.append(0)
 
     ## 2-Zero Tension
-    𝜙Pn, 𝜙Mn, c = column.zero_tension(main_dia, df_swapped)
+    𝜙Pn, 𝜙Mn, c = column.zero_tension(main_dia, rebars_swapped)
     y_ir_muy.append(abs(𝜙Pn))
     x_ir_muy.append(𝜙Mn)
     nuetral_axis.append(c)
 
     ## 3-Balance
 
-    𝜙Pn, 𝜙Mn, c = column.balance(main_dia, df_swapped)
+    𝜙Pn, 𝜙Mn, c = column.balance(main_dia, rebars_swapped)
     y_ir_muy.append(abs(𝜙Pn))
     x_ir_muy.append(𝜙Mn)
     nuetral_axis.append(c)
 
     ## 4-Pure Bending
 
-    𝜙Pn, 𝜙Mn, c = column.pure_bending(main_dia, df_swapped)
+    𝜙Pn, 𝜙Mn, c = column.pure_bending(main_dia, rebars_swapped)
     y_ir_muy.append(0)
     x_ir_muy.append(𝜙Mn)
     nuetral_axis.append(c)
@@ -171,13 +195,30 @@ def y_axis(main_dia, N, df_rebars, column):
     print(f"𝜙Pn_max = {abs(𝜙Pn_max):.2f} kN")
     display_table(df)
 
+    𝜙Mn, c = column.capacity_at(FLAGS.Pu, main_dia, rebars_swapped["z"], Ast, An)
+    print(f"𝜙Mn at Pu = {FLAGS.Pu:.2f} kN : {𝜙Mn:.2f} kN-m, Muy = {FLAGS.Muy:.2f} kN-m")
+
+    ## Dense curve between zero tension and pure bending
+    _, 𝜙Pn, 𝜙Mn = column.dense_curve(
+        nuetral_axis[0],
+        nuetral_axis[-1],
+        main_dia,
+        rebars_swapped["z"],
+        FLAGS.n_points,
+        FLAGS.curve_tol,
+        nuetral_axis,
+    )
+
+    x_ir_muy = [x_ir_muy[0], *𝜙Mn, x_ir_muy[-1]]
+    y_ir_muy = [y_ir_muy[0], *-𝜙Pn, y_ir_muy[-1]]
+
     return x_ir_muy, y_ir_muy
 
 
 # ----------------------------------------------------------------
 ## Main function
 # ----------------------------------------------------------------
-def create_ir_diagram(main_dia, traverse_dia):
+def ask_layers():
     # Lay rebars
     while True:
 
@@ -196,11 +237,65 @@ def create_ir_diagram(main_dia, traverse_dia):
         else:
             pass
 
+    return bottom_layers, top_layers, middle_rebars
+
+
+def axis_column(b, h, main_dia, traverse_dia, Ast, An, Ag, verbose=True):
+    # Instanciated
+    column = Column(
+        FLAGS.fc,
+        FLAGS.fv,
+        FLAGS.fy,
+        FLAGS.Es,
+        b,
+        h,
+        section="rect",
+        stirrup="tie",
+        concrete=FLAGS.concrete,
+        mesh=FLAGS.mesh,
+        verbose=verbose,
+    )
+    column.initialize(main_dia / 10, traverse_dia / 10, Ast, An, Ag)
+    column.traverse(An, Ag, main_dia / 10, traverse_dia / 10)
+    return column
+
+
+# Tasks of one section, independent of each other
+def x_task(main_dia, traverse_dia, N, rebars, areas):
+    print(f"\nX-X Axis")
+    column = axis_column(FLAGS.b, FLAGS.h, main_dia, traverse_dia, *areas)
+
+    # Coordinate for IR-diagrams for Mux
+    return x_axis(main_dia, N, rebars, column)
+
+
+def y_task(main_dia, traverse_dia, N, rebars, areas):
+    print(f"\nY-Y Axis")
+    # Swapp b, h
+    column = axis_column(FLAGS.h, FLAGS.b, main_dia, traverse_dia, *areas)
+
+    # Coordinate for IR-diagrams for Muy
+    return y_axis(main_dia, N, rebars, column)
+
+
+def surface_task(main_dia, traverse_dia, N, rebars, areas):
+    column = axis_column(
+        FLAGS.b, FLAGS.h, main_dia, traverse_dia, *areas, verbose=False
+    )
+
+    # P-Mx-My surface for biaxial check
+    Ast, An, _ = areas
+    return interaction_surface(column, rebars["x"], rebars["y"], main_dia, Ast, An)
+
+
+def create_ir_diagram(
+    main_dia, traverse_dia, bottom_layers, top_layers, middle_rebars, workers=1
+):
     # Total rebars
     N = sum(bottom_layers + top_layers)
 
     # Get the rebar coordinates
-    df_rebars = get_rebar_coordinates(
+    rebars = get_rebar_coordinates(
         FLAGS.b,
         FLAGS.h,
         FLAGS.c,
@@ -214,43 +309,19 @@ def create_ir_diagram(main_dia, traverse_dia):
     # Calculalte concrete and rebars area
     Ag, Ast, An = calculate_areas_in_rect(FLAGS.b, FLAGS.h, main_dia / 10, N)  # cm2
 
-    # ----------------------------------------------------------------
-    print(f"\nX-X Axis")
-    # Instanciated
-    column = Column(
-        FLAGS.fc,
-        FLAGS.fv,
-        FLAGS.fy,
-        FLAGS.Es,
-        FLAGS.b,
-        FLAGS.h,
-        section="rect",
-        stirrup="tie",
+    # X-X Axis, P-Mx-My surface and Y-Y Axis, concurrently if workers != 1
+    args = (main_dia, traverse_dia, N, rebars, (Ast, An, Ag))
+    (x_ir_mux, y_ir_mux), surface, (x_ir_muy, y_ir_muy) = run_ordered(
+        [(x_task, args), (surface_task, args), (y_task, args)],
+        FLAGS.backend,
+        workers,
     )
-    column.initialize(main_dia / 10, traverse_dia / 10, Ast, An, Ag)
-    column.traverse(An, Ag, main_dia / 10, traverse_dia / 10)
-
-    # Coordinate for IR-diagrams for Mux
-    x_ir_mux, y_ir_mux = x_axis(main_dia, N, df_rebars, column)
 
     # ----------------------------------------------------------------
-    print(f"\nY-Y Axis")
-    # Instanciated
-    column = Column(
-        FLAGS.fc,
-        FLAGS.fv,
-        FLAGS.fy,
-        FLAGS.Es,
-        FLAGS.h,
-        FLAGS.b,
-        section="rect",
-        stirrup="tie",
-    )  # Swapp b, h
-    column.initialize(main_dia / 10, traverse_dia / 10, Ast, An, Ag)
-    column.traverse(An, Ag, main_dia / 10, traverse_dia / 10)
+    dc = demand_capacity([[FLAGS.Pu, FLAGS.Mux, FLAGS.Muy]], surface)[0]
+    print(f"\nBiaxial D/C = {dc:.2f} {'OK' if dc <= 1 else 'NOT OK'}")
 
-    # Coordinate for IR-diagrams for Muy
-    x_ir_muy, y_ir_muy = y_axis(main_dia, N, df_rebars, column)
+    from plot_rect import create_plot
 
     section_fig, ir_fig = create_plot(
         FLAGS.b,
@@ -273,7 +344,16 @@ def create_ir_diagram(main_dia, traverse_dia):
     return section_fig, ir_fig
 
 
+# One section of the report, for running sections concurrently
+def section_task(n, inputs, widths):
+    print(f"\n============== Section {n} ==============")
+    section_fig, ir_fig = create_ir_diagram(*inputs)
+    return section_block(section_fig, ir_fig, n, widths)
+
+
 def main(argv):
+    timing.enable(FLAGS.timing or FLAGS.timing_output is not None)
+
     print("====================== Rectangular Column Design ======================")
     print("[INFO] Section properties : ")
     print(
@@ -282,19 +362,28 @@ def main(argv):
     print(f"Column section: {FLAGS.b} x {FLAGS.h} cm")
     print(f"Pu: {FLAGS.Pu} kN, Mux: {FLAGS.Mux} kN-m, Muy: {FLAGS.Muy} kN-m")
 
+    from plot_rect import create_report
+
     n = 1
-    section_fig = []
-    ir_fig = []
+    # Each section is written as soon as it is computed
+    report = create_report(
+        max_bytes=FLAGS.report_max_mb * 2**20, max_sections=FLAGS.report_max_sections
+    )
 
+    # With workers != 1 all sections are asked first, then run concurrently
+    sections = []
     while True:
         print(f"\n============== Section {n} ==============")
         main_dia = get_valid_integer("Main rebar diameter in mm : ")
         traverse_dia = get_valid_integer("Traverse rebar diameter in mm : ")
+        inputs = (main_dia, traverse_dia, *ask_layers())
 
-        section, ir = create_ir_diagram(main_dia, traverse_dia)
-
-        section_fig.append(section)
-        ir_fig.append(ir)
+        if FLAGS.workers == 1:
+            section, ir = create_ir_diagram(*inputs)
+            report.add(section, ir)
+            del section, ir
+        else:
+            sections.append(inputs)
 
         ask = input("Any section? , Y|N : ").upper()
         if ask == "N":
@@ -302,7 +391,26 @@ def main(argv):
         else:
             n += 1
 
-    create_html(section_fig, ir_fig)
+    if len(sections) == 1:
+        # One section, its axes run concurrently
+        section, ir = create_ir_diagram(*sections[0], workers=FLAGS.workers)
+        report.add(section, ir)
+    elif sections:
+        tasks = [
+            (section_task, (i + 1, s, report.widths)) for i, s in enumerate(sections)
+        ]
+        for block in run_ordered(tasks, FLAGS.backend, FLAGS.workers):
+            report.write(block)
+
+    report.close()
+    print(f"Congrate! Please open {report.pages[0]} in your project folder")
+    if len(report.pages) > 1:
+        print(f"[INFO] Report split into {len(report.pages)} pages")
+
+    if FLAGS.timing:
+        timing.summary()
+    if FLAGS.timing_output:
+        timing.to_json(FLAGS.timing_output)
 
 
 # Call the main function
@@ -0,0 +1,153 @@
+import os
+
+import timing
+
+PAGE_HEAD = """
+<html>
+    <head>
+        <meta charset="utf-8">
+        <title>{title}</title>
+        <script src="https://cdn.plot.ly/plotly-latest.min.js"></script>
+    </head>
+    <body>
+"""
+
+PAGE_TAIL = """
+    </body>
+</html>
+"""
+
+NAV = """
+        <div style="display: flex; justify-content: space-between; margin: 20px;">
+            <div>{prev}</div>
+            <div>Page {page}</div>
+            <div>{next}</div>
+        </div>
+"""
+
+BLOCK = """
+        <div style="display: flex; justify-content: space-around; margin-bottom: 30px;">
+            <div style="width: {section_width};">
+                <h1>Section Plot {label}</h1>
+                {section_html}
+            </div>
+            <div style="width: {ir_width};">
+                <h1>IR Diagram {label}</h1>
+                {ir_html}
+            </div>
+        </div>
+"""
+
+
+def section_block(section_fig, ir_fig, label, widths=("48%", "48%")):
+    """
+    HTML of one section, the section plot beside its IR-diagram
+    Can be built in a worker process and passed to HTMLReport.write
+    """
+    with timing.stage("HTML writing"):
+        return BLOCK.format(
+            section_width=widths[0],
+            ir_width=widths[1],
+            label=label,
+            section_html=section_fig.to_html(full_html=False, include_plotlyjs=False),
+            ir_html=ir_fig.to_html(full_html=False, include_plotlyjs=False),
+        )
+
+
+# ----------------------------------------------------------------
+## Streaming report
+# ----------------------------------------------------------------
+class HTMLReport:
+    """
+    Writes each section to disk as it is added, so only one section's
+    figures are alive at a time. When a page reaches max_bytes or
+    max_sections the next section starts a new file, name_2.html, ...
+    linked to its neighbours. max_bytes / max_sections = None, no limit.
+    """
+
+    def __init__(
+        self, path, title, widths=("48%", "48%"), max_bytes=None, max_sections=None
+    ):
+        self.path = path
+        self.title = title
+        self.widths = widths
+        self.max_bytes = max_bytes
+        self.max_sections = max_sections
+        self.pages = []
+        self.sections = 0  # in all pages
+        self.file = None
+
+    def _page_path(self, page):
+        if page == 1:
+            return self.path
+        root, ext = os.path.splitext(self.path)
+        return f"{root}_{page}{ext}"
+
+    def _write(self, text):
+        data = text.encode("utf-8")
+        self.file.write(data)
+        self.page_bytes += len(data)
+
+    def _open_page(self):
+        page = len(self.pages) + 1
+        path = self._page_path(page)
+        self.file = open(path, "wb")
+        self.pages.append(path)
+        self.page_bytes = 0
+        self.page_sections = 0
+
+        self._write(PAGE_HEAD.format(title=self.title))
+        if page > 1:
+            prev = os.path.basename(self._page_path(page - 1))
+            self._write(
+                NAV.format(prev=f'<a href="{prev}">Previous</a>', page=page, next="")
+            )
+
+    def _close_page(self, last):
+        page = len(self.pages)
+        if not last:
+            following = os.path.basename(self._page_path(page + 1))
+            self._write(
+                NAV.format(prev="", page=page, next=f'<a href="{following}">Next</a>')
+            )
+        self._write(PAGE_TAIL)
+        self.file.close()
+        self.file = None
+
+    def _page_full(self):
+        if self.max_bytes is not None and self.page_bytes >= self.max_bytes:
+            return True
+        if self.max_sections is not None and self.page_sections >= self.max_sections:
+            return True
+        return False
+
+    def write(self, block):
+        """block : HTML of one section from section_block()"""
+        if self.file is None:
+            self._open_page()
+        elif self.page_sections and self._page_full():
+            self._close_page(last=False)
+            self._open_page()
+
+        with timing.stage("HTML writing"):
+            self._write(block)
+            self.file.flush()
+        self.page_sections += 1
+        self.sections += 1
+
+    def add(self, section_fig, ir_fig, label=None):
+        label = self.sections + 1 if label is None else label
+        self.write(section_block(section_fig, ir_fig, label, self.widths))
+
+    def close(self):
+        if self.file is None and not self.pages:
+            self._open_page()  # empty report
+        if self.file is not None:
+            self._close_page(last=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
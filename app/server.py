@@ -0,0 +1,271 @@
+import json
+import math
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from absl import app, flags, logging
+from absl.flags import FLAGS
+
+import batch
+from cache import CurveCache
+from check import FacetIndex, surface_facets
+from pipeline import load_checks, capacity_lookups
+from lookup import CapacityLookup
+
+flags.DEFINE_string("host", "127.0.0.1", "address to listen on, localhost only")
+flags.DEFINE_integer("port", 8765, "port to listen on")
+flags.DEFINE_integer("max_sections", 256, "sections kept in memory")
+
+
+# ----------------------------------------------------------------
+## Warm sections, shared by all requests
+# ----------------------------------------------------------------
+class SectionStore:
+    """
+    Capacity (as batch.row_capacity) and facet index of the sections seen
+    so far, kept across requests. Concurrent requests for one section wait
+    for the same computation instead of repeating it.
+    """
+
+    def __init__(self, cache_dir=None, max_items=256):
+        self.curves = CurveCache(cache_dir, max_items=max_items)
+        self.indexes = OrderedDict()
+        self.max_items = max_items
+        self.lock = threading.Lock()
+        self.pending = {}  # key: Future of the running computation
+        self.coalesced = 0
+
+    def _once(self, key, compute):
+        with self.lock:
+            future = self.pending.get(key)
+            owner = future is None
+            if owner:
+                future = self.pending[key] = Future()
+            else:
+                self.coalesced += 1
+
+        if not owner:
+            return future.result()
+
+        try:
+            value = compute()
+            future.set_result(value)
+            return value
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                del self.pending[key]
+
+    def capacity(self, row):
+        key = batch.capacity_key(row)
+        return self._once(
+            key,
+            lambda: self.curves.get_or_compute(key, lambda: batch.row_capacity(row)),
+        )
+
+    # FacetIndex of the surface of rect and polygon sections, None for circle
+    def index(self, row, capacity):
+        if row["section"] == "circle":
+            return None
+        key = batch.capacity_key(row)
+        with self.lock:
+            if key in self.indexes:
+                self.indexes.move_to_end(key)
+                return self.indexes[key]
+
+        def build():
+            surface = [capacity[f"surface_{k}"] for k in ("Pn", "Mnx", "Mny")]
+            return FacetIndex(surface_facets(*surface))
+
+        index = self._once(f"index-{key}", build)
+        with self.lock:
+            self.indexes[key] = index
+            while len(self.indexes) > self.max_items:
+                self.indexes.popitem(last=False)
+        return index
+
+    def stats(self):
+        with self.lock:
+            return {
+                "sections": len(self.curves.memory),
+                "hits": self.curves.hits,
+                "misses": self.curves.misses,
+                "coalesced": self.coalesced,
+                "running": len(self.pending),
+            }
+
+
+# ----------------------------------------------------------------
+## Endpoints, JSON in and out
+# ----------------------------------------------------------------
+def _row(body):
+    """Section fields as a row of batch.py, missing fields take its DEFAULTS"""
+    if not isinstance(body, dict) or "section" not in body:
+        raise ValueError("section fields with 'section' (rect|circle|polygon)")
+    return batch.DEFAULTS | {k: v for k, v in body.items() if v is not None}
+
+
+# NaN and inf are not JSON, sent as null
+def _plain(value):
+    if isinstance(value, dict):
+        return {k: _plain(v) for k, v in value.items()}
+    if isinstance(value, np.ndarray):
+        value = value.tolist()
+    if isinstance(value, (list, tuple)):
+        return [_plain(v) for v in value]
+    if isinstance(value, (float, np.floating)):
+        return float(value) if math.isfinite(value) else None
+    if isinstance(value, np.integer):
+        return int(value)
+    return value
+
+
+def capacity(store, body):
+    """
+    body : section fields as a row of batch.py
+    Returns control points, and with "curves": true the IR-curves and surface
+    """
+    row = _row(body)
+    result = store.capacity(row)
+    if not body.get("curves"):
+        result = {k: v for k, v in result.items() if np.ndim(v) == 0}
+    return result
+
+
+def check(store, body):
+    """
+    body : section fields and loads [[Pu, Mux, Muy], ...] (kN, kN-m), or one
+        load as Pu, Mux, Muy
+    Returns the 𝜙Mn_at_Pu and D/C columns of batch.py for each load,
+    null = the load is outside the capacity.
+    """
+    row = _row(body)
+    loads = body.get("loads") or [[row["Pu"], row["Mux"], row["Muy"]]]
+    loads = np.asarray(loads, dtype=float).reshape(-1, 3)
+
+    result = store.capacity(row)
+    index = store.index(row, result)
+    lookups = capacity_lookups(result)
+
+    # All loads in one vectorized check, then one dict per load
+    checks = load_checks(row["section"], *loads.T, lookups, index=index)
+    return {"checks": [dict(zip(checks, v)) for v in zip(*checks.values())]}
+
+
+def capacity_at(store, body):
+    """
+    body : section fields, Pu [...] (kN, compression positive) and / or
+        Mu [...] (kN-m)
+    Returns 𝜙Mn at each Pu and 𝜙Pn on the compression and tension side at
+    each Mu, for each axis of the section, from the interpolated IR-curves
+    """
+    row = _row(body)
+    result = store.capacity(row)
+    labels = [""] if row["section"] == "circle" else ["_x", "_y"]
+
+    answer = {}
+    for label in labels:
+        if f"lookup{label}_Mn" not in result:
+            continue  # no Y-Y curve of polygon
+        lookup = CapacityLookup.from_arrays(result, f"lookup{label}_")
+        if "Pu" in body:
+            answer[f"𝜙Mn{label}"] = lookup.Mn_at(body["Pu"])
+        if "Mu" in body:
+            compression, tension = lookup.Pn_at(body["Mu"])
+            answer[f"𝜙Pn_compression{label}"] = compression
+            answer[f"𝜙Pn_tension{label}"] = tension
+    return answer
+
+
+ROUTES = {"/capacity": capacity, "/check": check, "/capacity_at": capacity_at}
+
+
+class Handler(BaseHTTPRequestHandler):
+    """
+    POST /capacity, /check and /capacity_at take one JSON object, or a list
+    of them answered in the same order. GET /health and GET /stats for
+    monitoring.
+    """
+
+    store = None
+
+    def _send(self, status, body):
+        data = json.dumps(_plain(body), ensure_ascii=False, allow_nan=False).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send(200, {"status": "ok"})
+        elif self.path == "/stats":
+            self._send(200, self.store.stats())
+        else:
+            self._send(404, {"error": f"no endpoint {self.path}"})
+
+    def do_POST(self):
+        route = ROUTES.get(self.path)
+        if route is None:
+            self._send(404, {"error": f"no endpoint {self.path}"})
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+            if isinstance(body, list):
+                result = [route(self.store, b) for b in body]
+            else:
+                result = route(self.store, body)
+        except (ValueError, KeyError, TypeError) as e:
+            self._send(400, {"error": f"{type(e).__name__}: {e}"})
+            return
+        except Exception as e:
+            logging.exception("%s failed", self.path)
+            self._send(500, {"error": f"{type(e).__name__}: {e}"})
+            return
+
+        self._send(200, result)
+
+    def log_message(self, format, *args):
+        logging.info("%s - %s", self.address_string(), format % args)
+
+
+def serve(host="127.0.0.1", port=8765, cache_dir=None, max_sections=256):
+    """Server of a new SectionStore, call serve_forever() to run it"""
+    handler = type(
+        "Handler", (Handler,), {"store": SectionStore(cache_dir, max_sections)}
+    )
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main(argv):
+    server = serve(FLAGS.host, FLAGS.port, FLAGS.cache_dir, FLAGS.max_sections)
+    host, port = server.server_address[:2]
+    print(f"[INFO] Column design checks on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    app.run(main)
+
+"""
+python app/server.py --port=8765 --cache_dir=.cache
+curl -X POST localhost:8765/check -d '{"section": "rect", "b": 30, "h": 50,
+    "main_dia": 20, "traverse_dia": 9, "bottom_layers": "3 2",
+    "top_layers": "3", "middle_rebars": 2, "loads": [[2500, 120, 25]]}'
+"""
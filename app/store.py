@@ -0,0 +1,222 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+META = "meta.json"
+
+# Text columns of batch.py and forces.py, whatever type their first value has
+LABELS = ("id", "section", "member", "combo", "error")
+
+
+# ----------------------------------------------------------------
+## Columnar results on disk, one raw file per column
+# ----------------------------------------------------------------
+class ResultWriter:
+    """
+    Results appended row by row into a directory of column files, so a run
+    of any size keeps only the last batch_size rows in memory.
+
+    Numbers are float64, NaN where a row has no value. 1-D arrays (e.g. dense
+    curves) may differ in length from row to row, their values are one flat
+    float64 file with the int64 offsets of the rows in another, empty where
+    missing. Other arrays are float64 rows of a fixed width. Text, and every
+    value of the labels columns (id, section, member, combo, error) even a
+    number, is int32 codes into a table of labels, -1 where missing.
+    Columns first seen after some rows are back-filled as missing.
+    """
+
+    def __init__(self, path, batch_size=4096, labels=LABELS):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.batch_size = batch_size
+        self.length = 0
+        self.columns = {}  # name: {"kind", "dtype", "shape"}
+        self.files = {}
+        self.offsets = {}  # name: offsets file of 1-D array columns
+        self.ends = {}  # name: values written so far
+        self.labels = {}  # name: {label: code}
+        self.label_columns = set(labels)
+        self.pending = []
+
+    def append(self, row):
+        self.pending.append(row)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(row)
+
+    def _add(self, name, value):
+        if name in self.label_columns or isinstance(value, str):
+            column = {"kind": "label", "dtype": "int32", "shape": []}
+            self.labels[name] = {}
+        elif np.ndim(value) == 1:
+            column = {"kind": "ragged", "dtype": "float64", "shape": []}
+        else:
+            column = {
+                "kind": "float",
+                "dtype": "float64",
+                "shape": list(np.shape(value)),
+            }
+        self.columns[name] = column
+        self.files[name] = open(os.path.join(self.path, f"{name}.bin"), "wb")
+
+        # Rows written before the column existed, empty arrays
+        if column["kind"] == "ragged":
+            self.ends[name] = 0
+            self.offsets[name] = open(os.path.join(self.path, f"{name}.offsets"), "wb")
+            self.offsets[name].write(np.zeros(self.length + 1, np.int64).tobytes())
+            return
+
+        # Rows written before the column existed
+        missing = self._missing(name, 1)
+        for start in range(0, self.length, self.batch_size):
+            n = min(self.batch_size, self.length - start)
+            self.files[name].write(np.repeat(missing, n, axis=0).tobytes())
+
+    def _missing(self, name, n):
+        column = self.columns[name]
+        fill = -1 if column["kind"] == "label" else np.nan
+        return np.full([n, *column["shape"]], fill, dtype=column["dtype"])
+
+    def _encode(self, name, values):
+        data = self._missing(name, len(values))
+        labels = self.labels.get(name)
+        for i, value in enumerate(values):
+            if value is None:
+                continue
+            if labels is not None:
+                data[i] = labels.setdefault(str(value), len(labels))
+            elif np.shape(value) != data.shape[1:]:
+                raise ValueError(
+                    f"{name} has shape {np.shape(value)}, expected {data.shape[1:]}"
+                )
+            else:
+                data[i] = value
+        return data
+
+    def flush(self):
+        rows, self.pending = self.pending, []
+        if not rows:
+            return
+
+        for row in rows:
+            for name, value in row.items():
+                if name not in self.columns and value is not None:
+                    self._add(name, value)
+
+        for name in self.columns:
+            values = [row.get(name) for row in rows]
+            if self.columns[name]["kind"] == "ragged":
+                self._write_ragged(name, values)
+            else:
+                self.files[name].write(self._encode(name, values).tobytes())
+        self.length += len(rows)
+
+    # Values of the rows one after another, then the offset each row ends at
+    def _write_ragged(self, name, values):
+        arrays = [np.ravel(np.asarray([] if v is None else v, float)) for v in values]
+        ends = self.ends[name] + np.cumsum([len(a) for a in arrays], dtype=np.int64)
+        self.files[name].write(np.concatenate(arrays).tobytes())
+        self.offsets[name].write(ends.tobytes())
+        self.ends[name] = int(ends[-1])
+
+    def close(self):
+        self.flush()
+        for f in [*self.files.values(), *self.offsets.values()]:
+            f.close()
+
+        meta = {"length": self.length, "columns": self.columns}
+        meta["labels"] = {name: list(labels) for name, labels in self.labels.items()}
+        with open(os.path.join(self.path, META), "w") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ResultStore:
+    """
+    Results of ResultWriter opened read-only, numeric columns are memmaps
+    of the files so nothing is parsed or copied until read, e.g.
+        results = ResultStore("results")
+        results["DC"].max()
+        results["curve_Pn_x"][i]  # dense curve of row i
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, META)) as f:
+            meta = json.load(f)
+        self.length = meta["length"]
+        self.columns = meta["columns"]
+        self.labels = meta["labels"]
+
+    def __len__(self):
+        return self.length
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def _map(self, file, dtype, shape):
+        if 0 in shape:
+            return np.empty(shape, dtype=dtype)
+        path = os.path.join(self.path, file)
+        return np.memmap(path, dtype=dtype, mode="r", shape=shape)
+
+    # Zero-copy array of a column, int32 codes for text columns
+    def array(self, name):
+        column = self.columns[name]
+        if column["kind"] == "ragged":
+            offsets = self._map(f"{name}.offsets", np.int64, (self.length + 1,))
+            values = self._map(f"{name}.bin", column["dtype"], (int(offsets[-1]),))
+            return RaggedColumn(values, offsets)
+        return self._map(
+            f"{name}.bin", column["dtype"], (self.length, *column["shape"])
+        )
+
+    def __getitem__(self, name):
+        """Array of the column, text columns decoded to str, None if missing"""
+        data = self.array(name)
+        if self.columns[name]["kind"] != "label":
+            return data
+        labels = np.array([*self.labels[name], None], dtype=object)
+        return labels[data]  # code -1 is the None at the end
+
+    def to_frame(self, names=None):
+        """DataFrame of the scalar columns, or of names"""
+        if names is None:
+            names = [
+                k
+                for k, c in self.columns.items()
+                if not c["shape"] and c["kind"] != "ragged"
+            ]
+        return pd.DataFrame({name: self[name] for name in names})
+
+
+class RaggedColumn:
+    """
+    Rows of a 1-D array column, row i is values[offsets[i]:offsets[i + 1]],
+    a zero-copy slice of the values memmap
+    """
+
+    def __init__(self, values, offsets):
+        self.values = values
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        i = range(len(self))[i]
+        return self.values[self.offsets[i] : self.offsets[i + 1]]
+
+    # Length of each row
+    def lengths(self):
+        return np.diff(self.offsets)
@@ -0,0 +1,131 @@
+import json
+import os
+import threading
+import time
+from contextlib import nullcontext
+from functools import wraps
+
+# Switched on by enable() or COLUMN_TIMING=1, off it costs one flag check
+ENABLED = os.environ.get("COLUMN_TIMING", "") not in ("", "0")
+
+_lock = threading.Lock()
+_timers = {}  # name -> [calls, total seconds, max seconds]
+_counters = {}  # name -> count
+
+
+def enable(on=True):
+    global ENABLED
+    ENABLED = on
+
+
+class _Stage:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        with _lock:
+            timer = _timers.setdefault(self.name, [0, 0.0, 0.0])
+            timer[0] += 1
+            timer[1] += elapsed
+            timer[2] = max(timer[2], elapsed)
+        return False
+
+
+_NULL = nullcontext()
+
+
+# with stage("name"): ...
+def stage(name):
+    return _Stage(name) if ENABLED else _NULL
+
+
+# Decorator timing every call of a function as one stage
+def timed(name):
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return fn(*args, **kwargs)
+            with _Stage(name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def count(name, n=1):
+    if ENABLED:
+        with _lock:
+            _counters[name] = _counters.get(name, 0) + n
+
+
+# ----------------------------------------------------------------
+## Export
+# ----------------------------------------------------------------
+def snapshot(reset_after=False):
+    with _lock:
+        data = {
+            "timers": {
+                name: {"calls": calls, "total_s": total, "max_s": longest}
+                for name, (calls, total, longest) in _timers.items()
+            },
+            "counters": dict(_counters),
+        }
+        if reset_after:
+            _timers.clear()
+            _counters.clear()
+    return data
+
+
+# Add a snapshot from another process or thread
+def merge(data):
+    with _lock:
+        for name, t in data["timers"].items():
+            timer = _timers.setdefault(name, [0, 0.0, 0.0])
+            timer[0] += t["calls"]
+            timer[1] += t["total_s"]
+            timer[2] = max(timer[2], t["max_s"])
+        for name, n in data["counters"].items():
+            _counters[name] = _counters.get(name, 0) + n
+
+
+def to_json(path):
+    with open(path, "w") as f:
+        json.dump(snapshot(), f, indent=2)
+
+
+def summary():
+    import pandas as pd
+    from utils import display_table
+
+    data = snapshot()
+    timers = pd.DataFrame(
+        [
+            {
+                "Stage": name,
+                "Calls": t["calls"],
+                "Total, ms": t["total_s"] * 1e3,
+                "Mean, ms": t["total_s"] / t["calls"] * 1e3,
+                "Max, ms": t["max_s"] * 1e3,
+            }
+            for name, t in sorted(
+                data["timers"].items(), key=lambda item: -item[1]["total_s"]
+            )
+        ],
+        columns=["Stage", "Calls", "Total, ms", "Mean, ms", "Max, ms"],
+    )
+    counters = pd.DataFrame(
+        sorted(data["counters"].items()), columns=["Counter", "Count"]
+    )
+
+    print("\n[INFO] Timing : ")
+    display_table(timers)
+    display_table(counters)
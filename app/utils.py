@@ -1,5 +1,7 @@
 import numpy as np
-from tabulate import tabulate
+
+import timing
+from rebars import RebarLayout
 
 
 def get_valid_integer(prompt):
@@ -15,8 +17,10 @@ def convert_input_to_list(input_string):
     return list(map(int, input_string.split()))
 
 
-# Display  table
+# Display  table, tabulate is only loaded when a table is printed
 def display_table(df):
+    from tabulate import tabulate
+
     print(
         tabulate(
             df,
@@ -28,19 +32,6 @@ def display_table(df):
     )
 
 
-# Sum values in a df column(+ and -)
-def sum_separate(df, column_name):
-    # Sum of positive values in column 'F'
-    positive_sum = df[df[column_name] > 0][column_name].sum()
-
-    # Sum of negative values in column column_name
-    negative_sum = df[df[column_name] < 0][column_name].sum()
-    return (
-        negative_sum,
-        positive_sum,
-    )
-
-
 # Compute concrete and rebars area in circular section
 def calculate_areas(dia, rebar_dia, N):
     # Gross section area (Ag) of the circular column
@@ -60,6 +51,117 @@ def calculate_areas(dia, rebar_dia, N):
     return Ag, Ast, An
 
 
+# Rebars coordinates and outlines of circular section
+@timing.timed("rebar layout")
+def information(section_dia, covering, main_dia, traverse_dia, N):
+    # Calculate the inner diameter
+    inner_dia = (
+        section_dia - 2 * covering - main_dia - traverse_dia
+    )  # for main reinforcements
+    inner_dia2 = section_dia - 2 * covering  # for covering
+    inner_dia3 = section_dia - 2 * covering - 2 * traverse_dia  # for traverse
+
+    # Create the solid circle for the column section
+    theta = np.linspace(0, 2 * np.pi, 100)
+    x_outer = (section_dia / 2) * np.cos(theta)
+    y_outer = (section_dia / 2) * np.sin(theta)
+
+    # Create the dotted circle for the covering
+    x_inner = (inner_dia2 / 2) * np.cos(theta)
+    y_inner = (inner_dia2 / 2) * np.sin(theta)
+
+    # Create the dotted circle for the traverse
+    x_traverse = (inner_dia3 / 2) * np.cos(theta)
+    y_traverse = (inner_dia3 / 2) * np.sin(theta)
+
+    # Create the positions for the rebars
+    theta_rebar = np.linspace(0.5 * np.pi, 2.5 * np.pi, N, endpoint=False)
+    # theta_rebar = np.linspace(0, 2 * np.pi, N, endpoint=False)
+    x_rebar = (inner_dia / 2) * np.cos(theta_rebar)
+    y_rebar = (inner_dia / 2) * np.sin(theta_rebar)
+
+    # Calculate distance from top of the column to each rebar
+    distance_from_top = (section_dia / 2) - y_rebar
+
+    # Rebar layout, main_dia in cm
+    rebars = RebarLayout(
+        x_rebar, y_rebar, distance_from_top, np.pi * (main_dia / 2) ** 2
+    )
+
+    context = {
+        "x_outer": x_outer,
+        "y_outer": y_outer,
+        "x_inner": x_inner,
+        "y_inner": y_inner,
+        "x_traverse": x_traverse,
+        "y_traverse": y_traverse,
+        "x_rebar": x_rebar,
+        "y_rebar": y_rebar,
+        "rebars": rebars,
+    }
+
+    return context
+
+
+# x of N rebars evenly spaced in one layer of rectangle section
+def calculate_rebar_positions(c, b, N, main_dia, travesre_dia):
+    if N == 1:
+        return [c + (b - 2 * c) / 2]
+    elif N == 2:
+        return [c + travesre_dia + main_dia / 2, b - c - travesre_dia - main_dia / 2]
+    else:
+        positions = [
+            c
+            + main_dia / 2
+            + travesre_dia
+            + i * (b - 2 * c - main_dia - 2 * travesre_dia) / (N - 1)
+            for i in range(N)
+        ]
+        return positions
+
+
+# Rebars coordinates of rectangle section
+@timing.timed("rebar layout")
+def get_rebar_coordinates(
+    b, d, c, main_dia, travesre_dia, bottom_layers, top_layers, middle_rebars
+):
+    x_rebar, y_rebar = [], []
+
+    # Calculate positions of top reinforcement layers
+    layer_spacing = 2 * main_dia
+    y_top_layers = [d - c - (i + 0.5) * layer_spacing for i in range(len(top_layers))]
+
+    for y, num_bars in zip(y_top_layers, top_layers):
+        x_positions = calculate_rebar_positions(c, b, num_bars, main_dia, travesre_dia)
+        x_rebar += x_positions
+        y_rebar += [y] * len(x_positions)
+
+    # Calculate positions of bottom reinforcement layers
+
+    y_bottom_layers = [c + (i + 0.5) * layer_spacing for i in range(len(bottom_layers))]
+
+    for y, num_bars in zip(y_bottom_layers, bottom_layers):
+        x_positions = calculate_rebar_positions(c, b, num_bars, main_dia, travesre_dia)
+        x_rebar += x_positions
+        y_rebar += [y] * len(x_positions)
+
+    # Calculate positions of middle reinforcement layers
+    if middle_rebars > 0:
+        n = middle_rebars // 2
+        d_middle = min(y_top_layers) - max(y_bottom_layers)
+        s = d_middle / (n + 1)
+
+        for i in range(1, n + 1):
+            y_position = max(y_bottom_layers) + s * i
+            x_rebar += [
+                c + travesre_dia + main_dia / 2,
+                b - c - travesre_dia - main_dia / 2,
+            ]
+            y_rebar += [y_position, y_position]
+
+    return RebarLayout.from_points(x_rebar, y_rebar, d, main_dia)
+
+
 # Compute concrete and rebars area in rectangle section
 def calculate_areas_in_rect(b, h, rebar_dia, N):
     # Gross section area (Ag) of the circular column
@@ -78,15 +180,194 @@ def calculate_areas_in_rect(b, h, rebar_dia, N):
     return Ag, Ast, An
 
 
-# Segment area above line
-def segment_area_above_line(dia, distance_from_top):
+# Circular segment above a line, for any array of depths at once
+def circular_segment(dia, distance_from_top):
+    """
+    dia : diameter of the circle, cm
+    distance_from_top : depth of the line, scalar or array, cm
+
+    Returns area (cm2) and centroid of the segment from top (cm), exact,
+    with the shape of distance_from_top
+    """
     R = dia / 2  # Radius of the column
-    h = R - distance_from_top  # Distance from center of the column to the line
 
-    if h < -R or h > R:
-        # If the line is completely outside the circle, return 0 area.
-        return 0 if h > R else np.pi * R**2
+    # Depth clipped so a line outside the circle gives 0 or the full area
+    d = np.clip(np.asarray(distance_from_top, dtype=float), 0, dia)
+    half_chord = np.sqrt(d * (dia - d))
+    θ = 2 * np.arctan2(half_chord, R - d)  # central angle
+
+    # Area of the circular segment R^2 / 2 (θ - sin θ),
+    # by its series for shallow segments where θ - sin θ cancels
+    t = θ**2
+    series = θ**3 / 6 * (1 - t / 20 * (1 - t / 42 * (1 - t / 72 * (1 - t / 110))))
+    area = R**2 / 2 * np.where(θ < 0.1, series, θ - np.sin(θ))
+
+    # Centroid above the center is 2/3 half_chord^3 / area,
+    # an empty segment sits at the top
+    ybar = np.divide(
+        2 / 3 * half_chord**3,
+        area,
+        out=np.full(np.shape(area), float(R)),
+        where=area > 0,
+    )
+    return area, R - ybar
+
+
+# Root of f inside [lo, hi] by false position (Illinois) with bisection
+# fallback, lo and hi can be arrays to solve many roots at once
+def bracketed_root(f, lo, hi, tol=1e-4, max_iter=50):
+    """
+    f : vectorized function, f(lo) and f(hi) must have opposite signs
+    tol : stop when the bracket is narrower than tol
+    Returns the roots, nan where [lo, hi] does not bracket a root
+    """
+    a, b = np.broadcast_arrays(np.asarray(lo, dtype=float), np.asarray(hi, dtype=float))
+    a, b = a.astype(float), b.astype(float)
+    fa, fb = f(a), f(b)
+
+    valid = np.sign(fa) * np.sign(fb) <= 0
+    for _ in range(max_iter):
+        if np.all((np.abs(b - a) <= tol) | (fb == 0) | ~valid):
+            break
+
+        # False position step, bisection if it leaves the bracket
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x = b - fb * (b - a) / (fb - fa)
+        outside = ~np.isfinite(x) | (x <= np.minimum(a, b)) | (x >= np.maximum(a, b))
+        x = np.where(outside, (a + b) / 2, x)
+        fx = f(x)
 
-    # Area of the circular segment
-    segment_area = R**2 * np.arccos(h / R) - h * np.sqrt(R**2 - h**2)
-    return segment_area
+        # Keep the root bracketed, halve the stale end (Illinois)
+        flip = np.sign(fx) != np.sign(fb)
+        a, fa = np.where(flip, b, a), np.where(flip, fb, fa / 2)
+        b, fb = x, fx
+
+    return np.where(valid, b, np.nan)
+
+
+# Area and centroid of a polygon clipped by half-planes p·n >= k
+def half_plane_clip(vertices, n, k):
+    """
+    vertices : (V, 2) polygon vertices, counter clockwise, cm
+    n : (..., 2) unit normals pointing into the kept side
+    k : (...) offset of each clip line along n, cm
+
+    Returns area (cm2) and centroid x, y (cm) with the broadcast shape of n, k.
+    Shoelace terms are taken about a point on the clip line, so the clip
+    segment adds nothing and every edge is clipped independently.
+    """
+    vertices = np.asarray(vertices, dtype=float)
+    n = np.asarray(n, dtype=float)
+    k = np.asarray(k, dtype=float)
+    nx, ny = n[..., 0][..., None], n[..., 1][..., None]
+
+    # Vertices relative to the point on the clip line, (..., V)
+    ox, oy = nx * k[..., None], ny * k[..., None]
+    px, py = vertices[:, 0] - ox, vertices[:, 1] - oy
+    qx, qy = np.roll(px, -1, axis=-1), np.roll(py, -1, axis=-1)
+
+    # Signed distance inside the kept side
+    dp = px * nx + py * ny
+    dq = qx * nx + qy * ny
+
+    # Part of each edge inside, as parameter range [t0, t1] along the edge
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = np.where(dp != dq, dp / (dp - dq), 0)
+    t0 = np.where(dp >= 0, 0, t)
+    t1 = np.where(dq >= 0, 1, t)
+    t1 = np.where((dp < 0) & (dq < 0), t0, t1)
+
+    ax, ay = px + t0 * (qx - px), py + t0 * (qy - py)
+    bx, by = px + t1 * (qx - px), py + t1 * (qy - py)
+
+    cross = ax * by - bx * ay
+    area = cross.sum(axis=-1) / 2
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cx = ((ax + bx) * cross).sum(axis=-1) / (6 * area)
+        cy = ((ay + by) * cross).sum(axis=-1) / (6 * area)
+
+    cx = np.where(area > 0, cx, 0) + ox[..., 0]
+    cy = np.where(area > 0, cy, 0) + oy[..., 0]
+
+    return area, cx, cy
+
+
+# Rectangular section outline, counter clockwise, origin at bottom left, cm
+def rect_vertices(b, h):
+    return np.array([[0, 0], [b, 0], [b, h], [0, h]], dtype=float)
+
+
+# Signed area (cm2, positive when counter clockwise) and centroid of a polygon
+def polygon_area_centroid(vertices):
+    x, y = np.asarray(vertices, dtype=float).T
+    xn, yn = np.roll(x, -1), np.roll(y, -1)
+    cross = x * yn - xn * y
+    area = cross.sum() / 2
+    cx = ((x + xn) * cross).sum() / (6 * area)
+    cy = ((y + yn) * cross).sum() / (6 * area)
+    return area, cx, cy
+
+
+# Outline and holes of a polygon section, all turned counter clockwise
+def polygon_section(outer, holes=()):
+    def ccw(vertices):
+        vertices = np.asarray(vertices, dtype=float)
+        return vertices if polygon_area_centroid(vertices)[0] > 0 else vertices[::-1]
+
+    return ccw(outer), [ccw(hole) for hole in holes]
+
+
+# Gross area and centroid of a polygon with holes
+def section_area_centroid(outer, holes=()):
+    area, cx, cy = polygon_area_centroid(outer)
+    mx, my = area * cx, area * cy
+    for hole in holes:
+        a, hx, hy = polygon_area_centroid(hole)
+        area, mx, my = area - a, mx - a * hx, my - a * hy
+    return area, mx / area, my / area
+
+
+# Compressed area and centroid of a polygon with holes for many half-planes
+def section_clip(outer, holes, n, k):
+    """
+    Same as half_plane_clip, holes are clipped by the same half-planes
+    and taken out of the outline.
+    """
+    area, cx, cy = half_plane_clip(outer, n, k)
+    mx, my = area * cx, area * cy
+    for hole in holes:
+        a, hx, hy = half_plane_clip(hole, n, k)
+        area, mx, my = area - a, mx - a * hx, my - a * hy
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cx = np.where(area > 0, mx / area, cx)
+        cy = np.where(area > 0, my / area, cy)
+    return area, cx, cy
+
+
+# Points inside a polygon, even-odd rule, (points,) bool
+def points_in_polygon(x, y, vertices):
+    x = np.asarray(x, dtype=float)[:, None]
+    y = np.asarray(y, dtype=float)[:, None]
+    x0, y0 = np.asarray(vertices, dtype=float).T
+    x1, y1 = np.roll(x0, -1), np.roll(y0, -1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x_cross = x0 + (y - y0) * (x1 - x0) / (y1 - y0)
+    crossing = ((y0 > y) != (y1 > y)) & (x < x_cross)
+    return crossing.sum(axis=1) % 2 == 1
+
+
+# Compute concrete and rebars area in polygon section
+def calculate_areas_in_polygon(outer, holes, rebar_dia, N):
+    # Gross section area (Ag) of the polygon less its holes
+    Ag = section_area_centroid(outer, holes)[0]
+
+    # Total area of the rebars (Ast)
+    Ast = np.pi * (rebar_dia / 2) ** 2 * N
+
+    # Net area of the section (Ag - Ast)
+    An = Ag - Ast
+
+    return Ag, Ast, An
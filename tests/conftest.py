@@ -0,0 +1,15 @@
+import os
+import sys
+
+import pytest
+from absl import flags
+
+# The app modules import each other by name, as when run from app/
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "app"))
+
+
+# batch.py reads its flags, e.g. n_points, so they are parsed at their defaults
+@pytest.fixture(scope="session", autouse=True)
+def parsed_flags():
+    if not flags.FLAGS.is_parsed():
+        flags.FLAGS(["pytest"])
@@ -0,0 +1,375 @@
+import numpy as np
+import pytest
+
+import analysis
+import batch
+import forces
+import pipeline
+from analysis import Material, Section
+from cache import CurveCache, section_key
+from check import FacetIndex, demand_capacity, surface_facets, _ray_hits
+from hull import hull_candidates
+from lookup import CapacityLookup
+from store import ResultStore, ResultWriter
+from utils import (
+    bracketed_root,
+    circular_segment,
+    get_rebar_coordinates,
+    half_plane_clip,
+    information,
+    rect_vertices,
+    section_clip,
+)
+
+
+# ----------------------------------------------------------------
+## Sections of the checks
+# ----------------------------------------------------------------
+@pytest.fixture(scope="module")
+def rect():
+    # 30 x 50 cm, DB20 3 + 2 bottom, 3 top, 2 middle, RB9 ties
+    rebars = get_rebar_coordinates(30, 50, 4, 2.0, 0.9, [3, 2], [3], 2)
+    return Section("rect", 30, 50, rebars, 20, 9, N=8)
+
+
+@pytest.fixture(scope="module")
+def circle():
+    # 60 cm, 10-DB20, RB9 spiral
+    rebars = information(60, 4, 2.0, 0.9, 10)["rebars"]
+    return Section("circle", 60, 60, rebars, 20, 9, stirrup="spiral", N=10)
+
+
+# ----------------------------------------------------------------
+## Control points
+# ----------------------------------------------------------------
+# 𝜙Pn (kN) as the original rect.py / circular.py, pure tension from Ast in mm2.
+# 𝜙Mn (kN-m) about the centroid of the section.
+CONTROL_POINTS = {
+    "rect": {
+        "pure_compression": (2560.2139, 0.0),
+        "zero_tension": (653.0382, 50.0313),
+        "balance": (277.8838, 83.3901),
+        "pure_bending": (0.0, 64.1237),
+        "pure_tension": (-992.7433, 0.0),
+    },
+    "circle": {
+        "pure_compression": (4436.8831, 0.0),
+        "zero_tension": (2664.5854, 154.0966),
+        "balance": (1309.8289, 260.0510),
+        "pure_bending": (0.0, 141.6374),
+        "pure_tension": (-1240.9291, 0.0),
+    },
+}
+
+
+@pytest.mark.parametrize("name", ["rect", "circle"])
+def test_control_points(name, request):
+    curve = analysis.ir_curve(request.getfixturevalue(name), Material())
+
+    for point, (𝜙Pn, 𝜙Mn) in CONTROL_POINTS[name].items():
+        assert curve.point(point).𝜙Pn == pytest.approx(𝜙Pn, abs=1e-3)
+        assert curve.point(point).𝜙Mn == pytest.approx(𝜙Mn, abs=1e-3)
+
+    # Curve from pure compression to pure tension through the points
+    assert curve.Pn[0] == curve.point("pure_compression").𝜙Pn
+    assert curve.Pn[-1] == curve.point("pure_tension").𝜙Pn
+    assert not curve.Pn.flags.writeable
+
+
+# ----------------------------------------------------------------
+## 𝜙Mn at given Pu
+# ----------------------------------------------------------------
+def test_capacity_at_zero_load_is_pure_bending(rect):
+    𝜙Mn_pb = analysis.ir_curve(rect, Material()).point("pure_bending").𝜙Mn
+    𝜙Mn, _ = analysis.capacity_at(rect, Material(), [-1e-6, 0, 1e-9, 1e-6])
+
+    assert np.all(np.isfinite(𝜙Mn))
+    np.testing.assert_allclose(𝜙Mn, 𝜙Mn_pb, rtol=1e-6)
+
+
+@pytest.mark.parametrize("name", ["rect", "circle"])
+def test_capacity_at_on_dense_curve(name, request):
+    section = request.getfixturevalue(name)
+    column, _, Ast, An = analysis._column(section, Material())
+    z = section.rebars["z"]
+
+    c_pb = column.pure_bending_depth(section.main_dia, z)
+    c, 𝜙Pn, 𝜙Mn = column.dense_curve(column.d, c_pb, section.main_dia, z, 50)
+    𝜙Mn_at, c_at = column.capacity_at(-𝜙Pn[:-1], section.main_dia, z, Ast, An)
+
+    np.testing.assert_allclose(𝜙Mn_at, 𝜙Mn[:-1], rtol=1e-4, atol=1e-3)
+    np.testing.assert_allclose(c_at, c[:-1], atol=1e-3)
+
+
+def test_capacity_at_straight_segments(rect):
+    curve = analysis.ir_curve(rect, Material())
+    pc, zt, pb, pt = (
+        curve.point(name)
+        for name in ("pure_compression", "zero_tension", "pure_bending", "pure_tension")
+    )
+    Pu = [(pc.𝜙Pn + zt.𝜙Pn) / 2, pt.𝜙Pn / 2, pc.𝜙Pn + 1, pt.𝜙Pn - 1]
+    𝜙Mn, c = analysis.capacity_at(rect, Material(), Pu)
+
+    np.testing.assert_allclose(𝜙Mn[:2], [zt.𝜙Mn / 2, pb.𝜙Mn / 2])
+    assert np.isnan(𝜙Mn[2:]).all() and np.isnan(c).all()
+
+
+# ----------------------------------------------------------------
+## P-Mx-My surface
+# ----------------------------------------------------------------
+def test_surface_at_0_and_90_degrees_is_uniaxial_curve(rect):
+    Pn, Mnx, Mny = analysis.surface(rect, Material(), angles=[0, np.pi / 2])
+
+    Mn_x, _ = analysis.capacity_at(rect, Material(), Pn[0, 1:-1])
+    Mn_y, _ = analysis.capacity_at(rect.swapped(), Material(), Pn[1, 1:-1])
+    np.testing.assert_allclose(Mnx[0, 1:-1], Mn_x, rtol=1e-4, atol=1e-3)
+    np.testing.assert_allclose(Mny[1, 1:-1], Mn_y, rtol=1e-4, atol=1e-3)
+
+
+def test_surface_demand_capacity_on_x_curve(rect):
+    # Rebars are symmetric about the Y-Y axis, Mny is 0 on the X-X curve
+    surface = analysis.surface(rect, Material())
+    curve = analysis.ir_curve(rect, Material())
+    top = min(curve.Pn.max(), curve.diagnostics.𝜙Pn_max)
+    Pu = np.linspace(curve.Pn.min(), top, 41)[1:-1]
+    Mnx, _ = analysis.capacity_at(rect, Material(), Pu)
+
+    dc = demand_capacity(np.c_[Pu, Mnx, np.zeros_like(Pu)], surface)
+    np.testing.assert_allclose(dc, 1, atol=1e-3)
+
+
+def test_facet_index_matches_brute_force(rect):
+    facets = surface_facets(*analysis.surface(rect, Material()))
+    index = FacetIndex(facets)
+
+    rng = np.random.default_rng(0)
+    demands = rng.normal(size=(500, 3)) * [1500, 60, 40]
+    demands[:10] = [[1000, 0, 0], [-500, 0, 0], [0, 50, 0], [0, 0, -30]] + [[0] * 3] * 6
+
+    v = facets[None]
+    t = _ray_hits(demands[:, None], v[..., 0, :], v[..., 1, :], v[..., 2, :])
+    t = t.min(axis=1)
+    dc = np.where(np.abs(demands).sum(axis=1) > 0, 1 / t, 0)
+    np.testing.assert_allclose(demand_capacity(demands, index=index), dc, rtol=1e-9)
+
+    # With every bin emptied all rays take the fallback
+    index.starts = np.zeros_like(index.starts)
+    np.testing.assert_allclose(demand_capacity(demands, index=index), dc, rtol=1e-9)
+
+
+# ----------------------------------------------------------------
+## Load checks
+# ----------------------------------------------------------------
+ROWS = [
+    {"id": "C1", "section": "rect", "b": 30, "h": 50, "bottom_layers": "3 2"},
+    {"id": "C2", "section": "circle", "dia": 60, "N": 10, "stirrup": "spiral"},
+]
+ROWS = [
+    {**batch.DEFAULTS, "main_dia": 20, "traverse_dia": 9, "top_layers": "3"} | row
+    for row in ROWS
+]
+
+
+@pytest.mark.parametrize("row", ROWS, ids=lambda row: row["id"])
+def test_forces_and_batch_share_one_dc(row):
+    loads = np.array([[500, 40, 20], [0, 30, -10], [-200, -20, 5], [9000, 1, 1]])
+    capacity = batch.row_capacity(row)
+    expected = [
+        batch.check_loads(row | dict(zip(["Pu", "Mux", "Muy"], load)), capacity)["DC"]
+        for load in loads
+    ]
+
+    sections = forces.Sections([row])
+    np.testing.assert_allclose(sections.demand_capacity(row["id"], *loads.T), expected)
+
+
+def test_section_pipeline_takes_batch_defaults():
+    row = {
+        "section": "rect",
+        "b": 30,
+        "h": 50,
+        "main_dia": 20,
+        "traverse_dia": 9,
+        "bottom_layers": "3 2",
+        "Mux": 40,
+    }
+    p = pipeline.section_pipeline(**row)
+    full = batch.DEFAULTS | row
+    expected = batch.check_loads(full, batch.row_capacity(full))
+    assert p["checks"] == pytest.approx(expected)
+
+    assert p.set(Pu=300) == {"checks"}
+    assert p.set(fc=28) >= {"curve_x", "surface"}
+    assert "layout" in p.values
+
+
+# ----------------------------------------------------------------
+## Cache
+# ----------------------------------------------------------------
+def test_cache_returns_read_only_arrays(tmp_path):
+    cache = CurveCache(tmp_path)
+    arrays = cache.get_or_compute("a", lambda: {"Pn": np.arange(3.0)})
+
+    with pytest.raises(ValueError):
+        arrays["Pn"][0] = 1
+    assert not CurveCache(tmp_path).get("a")["Pn"].flags.writeable
+
+
+def test_cache_scans_disk_only_past_its_size(tmp_path, monkeypatch):
+    scans = []
+    evict = CurveCache.evict
+    monkeypatch.setattr(CurveCache, "evict", lambda self: scans.append(evict(self)))
+
+    def disk():
+        return sum(f.stat().st_size for f in tmp_path.iterdir())
+
+    CurveCache(tmp_path).put("probe", {"Pn": np.zeros(1000)})
+    max_bytes = 50 * disk()
+    cache = CurveCache(tmp_path, max_bytes=max_bytes)
+    for i in range(200):
+        cache.put(str(i), {"Pn": np.full(1000, i)})
+
+    # One scan on the first put, then one per 5 files past max_bytes
+    assert len(scans) <= 1 + 150 / 5 + 1
+    assert disk() <= max_bytes
+
+
+def test_cache_hits_and_misses(tmp_path):
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {"Pn": np.arange(3.0)}
+
+    cache = CurveCache(tmp_path, max_items=1)
+    cache.get_or_compute("a", compute)
+    cache.get_or_compute("a", compute)  # memory
+    cache.get_or_compute("b", compute)  # a leaves the memory tier
+    cache.get_or_compute("a", compute)  # disk
+    assert (len(calls), cache.hits, cache.misses) == (2, 2, 2)
+
+    # Another process sees the files, a cleared cache sees nothing
+    assert CurveCache(tmp_path).get("b") is not None
+    cache.clear()
+    assert cache.get("a") is None and CurveCache(tmp_path).get("b") is None
+
+
+def test_section_key_ignores_order_and_none():
+    key = section_key(b=30, h=50, bottom_layers=[3, 2], curve_tol=None)
+    assert key == section_key(h=50.0, b=30, bottom_layers=(3, 2))
+    assert key != section_key(b=30, h=50, bottom_layers=[2, 3])
+
+
+# ----------------------------------------------------------------
+## Result store
+# ----------------------------------------------------------------
+def test_store_round_trip(tmp_path):
+    rows = [
+        {"id": 1, "section": "rect", "DC": 0.5, "curve_Pn": np.arange(3.0)},
+        {"id": "C2", "error": "ValueError: x"},
+        {"id": 3, "DC": 1.5, "curve_Pn": np.arange(5.0), "surface": np.ones((2, 2))},
+    ]
+    with ResultWriter(tmp_path, batch_size=2) as writer:
+        writer.extend(rows)
+
+    store = ResultStore(tmp_path)
+    assert len(store) == 3
+    assert list(store["id"]) == ["1", "C2", "3"]
+    assert list(store["section"]) == ["rect", None, None]
+    assert list(store["error"]) == [None, "ValueError: x", None]
+    np.testing.assert_array_equal(store["DC"], [0.5, np.nan, 1.5])
+    np.testing.assert_array_equal(store["surface"][0], np.full((2, 2), np.nan))
+    np.testing.assert_array_equal(store["surface"][2], np.ones((2, 2)))
+
+    curves = store["curve_Pn"]
+    assert list(curves.lengths()) == [3, 0, 5]
+    np.testing.assert_array_equal(curves[-1], np.arange(5.0))
+    assert list(store.to_frame().columns) == ["id", "section", "DC", "error"]
+
+
+# ----------------------------------------------------------------
+## Geometry and numerics
+# ----------------------------------------------------------------
+def test_bracketed_root():
+    k = np.array([0.5, 2.0, 9.0, 20.0])
+    root = bracketed_root(lambda x: x**2 - k, np.zeros(4), np.full(4, 4.0), tol=1e-10)
+
+    np.testing.assert_allclose(root[:3], np.sqrt(k[:3]), atol=1e-9)
+    assert np.isnan(root[3])  # 20 is not between 0 and 4**2
+
+
+def test_circular_segment():
+    R = 30
+    depth = np.array([0, 1e-3, 10, R, 2 * R, 3 * R])
+    area, centroid = circular_segment(2 * R, depth)
+
+    # Exact area of the shallow segment, against its closed form
+    θ = 2 * np.arccos((R - depth[2]) / R)
+    assert area[2] == pytest.approx(R**2 / 2 * (θ - np.sin(θ)))
+    assert area[1] == pytest.approx(4 / 3 * np.sqrt(2 * R * 1e-3) * 1e-3, rel=1e-4)
+
+    # Half circle and full circle, centroids from top
+    assert area[3] == pytest.approx(np.pi * R**2 / 2)
+    assert centroid[3] == pytest.approx(R - 4 * R / (3 * np.pi))
+    np.testing.assert_allclose(area[4:], np.pi * R**2)
+    np.testing.assert_allclose(centroid[4:], R)
+    assert area[0] == 0
+
+
+def test_half_plane_clip_of_rect():
+    vertices = rect_vertices(30, 50)
+
+    # Top 20 cm, and the corner above x + y = 70
+    n = np.array([[0, 1], [np.sqrt(0.5), np.sqrt(0.5)]])
+    k = np.array([30, 70 * np.sqrt(0.5)])
+    area, cx, cy = half_plane_clip(vertices, n, k)
+
+    np.testing.assert_allclose(area, [600, 50])
+    np.testing.assert_allclose(cx, [15, 30 - 10 / 3])
+    np.testing.assert_allclose(cy, [40, 50 - 10 / 3])
+
+
+def test_section_clip_takes_out_holes():
+    outer = rect_vertices(60, 60)
+    hole = outer / 3 + 20  # 20 x 20 at the middle
+    n, k = np.array([0.0, 1.0]), np.array([30.0, 0.0, 61.0])
+    area, cx, cy = section_clip(outer, [hole], n, k)
+
+    np.testing.assert_allclose(area, [1800 - 200, 3600 - 400, 0])
+    np.testing.assert_allclose(cx[:2], 30)
+    assert cy[0] == pytest.approx((1800 * 45 - 200 * 35) / 1600)
+    assert cy[1] == pytest.approx(30)
+
+
+def test_capacity_lookup(rect):
+    curve = analysis.ir_curve(rect, Material())
+    lookup = CapacityLookup.from_curve(curve.Pn, curve.Mn)
+
+    np.testing.assert_allclose(lookup.Mn_at(curve.Pn), curve.Mn, atol=1e-6)
+    assert np.isnan(lookup.Mn_at([curve.Pn[0] + 1, curve.Pn[-1] - 1])).all()
+
+    # Both branches of Pn at a moment lie back on the curve, and meet at the top
+    Mu = np.linspace(5, 60, 12)
+    compression, tension = lookup.Pn_at(Mu)
+    assert (compression > tension).all()
+    np.testing.assert_allclose(lookup.Mn_at(compression), Mu, rtol=1e-3)
+    np.testing.assert_allclose(lookup.Mn_at(tension), Mu, rtol=1e-3)
+    top = np.array(lookup.Pn_at(curve.Mn.max()))
+    assert np.ptp(top) < 1
+
+    again = CapacityLookup.from_arrays(lookup.to_arrays())
+    Pu = np.linspace(curve.Pn[-1], curve.Pn[0], 50)
+    np.testing.assert_array_equal(again.Mn_at(Pu), lookup.Mn_at(Pu))
+
+
+def test_hull_candidates():
+    rng = np.random.default_rng(0)
+    corners = np.array(np.meshgrid([0, 1], [0, 1], [0, 1])).reshape(3, -1).T
+    inside = rng.uniform(0.2, 0.8, (200, 3))
+    points = np.r_[inside, corners]
+
+    np.testing.assert_array_equal(hull_candidates(points), np.arange(200, 208))
+    assert len(hull_candidates(points, margin=0.25)) > 8
+    np.testing.assert_array_equal(
+        hull_candidates([[1, 2, 0], [1, 5, 0], [1, 3, 0]]), [0, 1]
+    )